@@ -5,22 +5,223 @@ Provides intelligent insights using OpenAI or rule-based fallback.
 
 import json
 import html
-from typing import Dict, Any, List
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import orjson
 from config import Config
+from analyzer import LEVERAGE_RISK_MEDIUM
 
+# Shared HTTP session for AI provider calls (created on first use)
+_session = None
 
-def analyze_with_ai(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
+# Suggestion cache: in-process LRU in front of a per-key JSON file on disk.
+# The key rounds prices and PnL (see _canonical), so the TTL is kept short to
+# bound how far the advice can lag the live numbers.
+SUGGESTION_CACHE_TTL = 300  # seconds
+_SUGGESTION_CACHE_SIZE = 128
+_SUGGESTION_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'bbposexp')
+_suggestion_cache = OrderedDict()  # key -> (expires, suggestions)
+# Analyses run in worker threads (asyncio.to_thread), so guard the LRU
+_suggestion_cache_lock = threading.Lock()
+
+
+def _get_session():
+    """
+    Get the pooled HTTP session used for AI provider requests.
+    
+    Keeping one session alive lets repeated analyses reuse the TCP/TLS
+    connection to the provider instead of handshaking on every call.
+    
+    Returns:
+        requests.Session instance
+    """
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        _session = requests.Session()
+        _session.mount('https://', HTTPAdapter(pool_connections=3, pool_maxsize=10))
+    return _session
+
+
+def _coarse(value: float) -> float:
+    """Round to two significant figures so small price moves map to one value."""
+    if not value:
+        return 0.0
+    return round(value, 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def _canonical(analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the AI prompt inputs that decide the advice, for use as a cache key.
+    
+    Portfolio structure (symbols, sides, leverage, orders, risk counts) is kept
+    exactly; exposures, PnL and liquidation distances are coarsened to two
+    significant figures, so repeated polls of an unchanged portfolio reuse the
+    cached advice instead of producing a new key on every tick. Advice may
+    therefore reflect numbers up to SUGGESTION_CACHE_TTL seconds old.
+    
+    Args:
+        analysis_data: Complete analysis data
+    
+    Returns:
+        JSON-serializable dictionary of prompt inputs
+    """
+    portfolio = analysis_data['portfolio']
+    risks = analysis_data['risks']
+    return {
+        'long': _coarse(portfolio['total_long_exposure']),
+        'short': _coarse(portfolio['total_short_exposure']),
+        'bias': portfolio['bias'],
+        'positions': portfolio['total_positions'],
+        'orders': portfolio.get('total_orders', 0),
+        'pnl': _coarse(portfolio['total_unrealized_pnl']),
+        'high_leverage': risks['high_leverage_count'],
+        'close_liquidation': risks['close_liquidation_count'],
+        'no_stop_loss': risks.get('no_stop_loss_count', 0),
+        'risky': len(risks.get('risky_positions', [])),
+        'hedged': risks.get('hedged_symbols', []),
+        'top_positions': [
+            [p['symbol'], p['side'], p['leverage'],
+             _coarse(p['liquidation_distance_pct']), _coarse(p['unrealized_pnl'])]
+            for p in analysis_data['positions'][:5]
+        ],
+        'top_orders': [
+            [o['symbol'], o['side'], o['type'], o['price'], o['qty']]
+            for o in analysis_data.get('orders', [])[:5]
+        ],
+    }
+
+
+def _cache_key(provider: str, analysis_data: Dict[str, Any]) -> str:
+    """Build a stable cache key for a provider and analysis snapshot."""
+    canonical = json.dumps(_canonical(analysis_data), sort_keys=True)
+    return hashlib.sha1(f"{provider}:{canonical}".encode('utf-8')).hexdigest()
+
+
+def _remember(key: str, entry: tuple) -> None:
+    """Insert an entry into the in-memory LRU, evicting the oldest if full."""
+    with _suggestion_cache_lock:
+        _suggestion_cache[key] = entry
+        _suggestion_cache.move_to_end(key)
+        if len(_suggestion_cache) > _SUGGESTION_CACHE_SIZE:
+            _suggestion_cache.popitem(last=False)
+
+
+def _cache_get(key: str) -> Optional[Dict[str, List[str]]]:
+    """
+    Look up cached suggestions, checking memory first and then disk.
+    
+    Args:
+        key: Cache key from _cache_key
+    
+    Returns:
+        Cached suggestions, or None on a miss or expired entry
+    """
+    now = time.time()
+    path = os.path.join(_SUGGESTION_CACHE_DIR, f"{key}.json")
+    with _suggestion_cache_lock:
+        entry = _suggestion_cache.get(key)
+    if entry is None:
+        try:
+            with open(path, 'r') as f:
+                stored = json.load(f)
+            entry = (stored['expires'], stored['suggestions'])
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    expires, suggestions = entry
+    if expires < now:
+        with _suggestion_cache_lock:
+            _suggestion_cache.pop(key, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    
+    _remember(key, entry)
+    return suggestions
+
+
+def _sweep_cache_dir() -> None:
+    """
+    Delete expired suggestion files and keep at most _SUGGESTION_CACHE_SIZE.
+    
+    Files are written once per key, so their modification time tells their
+    age without opening them; the oldest go first.
+    """
+    cutoff = time.time() - SUGGESTION_CACHE_TTL
+    files = []
+    with os.scandir(_SUGGESTION_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith('.json'):
+                files.append((entry.stat().st_mtime, entry.path))
+    files.sort()
+    excess = len(files) - _SUGGESTION_CACHE_SIZE
+    for i, (mtime, path) in enumerate(files):
+        if mtime >= cutoff and i >= excess:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _cache_set(key: str, suggestions: Dict[str, List[str]]) -> None:
+    """
+    Store suggestions in memory and on disk (disk errors are ignored).
+    
+    Each write also sweeps expired and surplus files from the cache directory.
+    
+    Args:
+        key: Cache key from _cache_key
+        suggestions: Parsed provider suggestions
+    """
+    expires = time.time() + SUGGESTION_CACHE_TTL
+    _remember(key, (expires, suggestions))
+    
+    try:
+        os.makedirs(_SUGGESTION_CACHE_DIR, exist_ok=True)
+        path = os.path.join(_SUGGESTION_CACHE_DIR, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'expires': expires, 'suggestions': suggestions}, f)
+        os.replace(tmp_path, path)
+        _sweep_cache_dir()
+    except OSError:
+        pass
+
+
+# Sentinel meaning "resolve the AI provider from Config"
+_RESOLVE_PROVIDER = object()
+
+
+def analyze_with_ai(analysis_data: Dict[str, Any], provider: Any = _RESOLVE_PROVIDER) -> Dict[str, List[str]]:
     """
     Analyze position data and provide actionable suggestions.
     Uses AI (Gemini, Qwen, or OpenAI) if available, otherwise falls back to rule-based analysis.
     
     Args:
         analysis_data: Complete analysis from analyzer module
+        provider: Provider already resolved by the caller via
+            Config.get_ai_provider() (None for rule-based); looked up if omitted
     
     Returns:
         Dictionary with categorized suggestions (urgent, recommended, optional)
     """
-    provider = Config.get_ai_provider()
+    # Nothing to analyze - skip the provider round trip entirely
+    if not analysis_data['positions'] and not analysis_data.get('orders'):
+        return _fallback_analysis(analysis_data)
+    
+    if provider is _RESOLVE_PROVIDER:
+        provider = Config.get_ai_provider()
     
     if provider == 'gemini':
         try:
@@ -82,6 +283,46 @@ def analyze_with_ai(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
         return _fallback_analysis(analysis_data)
 
 
+def _read_openai_stream(response) -> Tuple[str, Optional[Dict[str, List[str]]]]:
+    """
+    Consume an OpenAI server-sent event stream.
+    
+    Content deltas are accumulated and parsed as soon as they form a complete
+    JSON object. The few events after that are still read (but ignored) so the
+    body is fully consumed and the connection goes back to the session pool
+    instead of being closed.
+    
+    Args:
+        response: Streaming requests response from the chat completions API
+    
+    Returns:
+        Tuple of (accumulated content, parsed suggestions or None)
+    """
+    chunks = []
+    suggestions = None
+    with response:
+        for line in response.iter_lines():
+            if suggestions is not None or not line.startswith(b'data: '):
+                continue
+            data = line[6:]
+            if data == b'[DONE]':
+                continue
+            
+            choices = orjson.loads(data).get('choices')
+            delta = choices[0].get('delta', {}).get('content') if choices else None
+            if not delta:
+                continue
+            chunks.append(delta)
+            
+            if '}' in delta:
+                try:
+                    suggestions = orjson.loads(''.join(chunks))
+                except orjson.JSONDecodeError:
+                    pass
+    
+    return ''.join(chunks), suggestions
+
+
 def _openai_analysis(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
     """
     Use OpenAI API to generate intelligent suggestions.
@@ -92,7 +333,10 @@ def _openai_analysis(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
     Returns:
         Categorized suggestions
     """
-    import requests
+    cache_key = _cache_key('openai', analysis_data)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
     
     # Prepare prompt
     system_prompt = """You are an expert cryptocurrency futures trading risk analyst. 
@@ -104,13 +348,13 @@ Be concise and specific. Provide 2-4 suggestions per category."""
     
     orders_info = ""
     if analysis_data.get('orders'):
-        orders_info = "\n\nOpen Orders:\n" + json.dumps([{
+        orders_info = "\n\nOpen Orders:\n" + orjson.dumps([{
             'symbol': o['symbol'],
             'side': o['side'],
             'type': o['type'],
             'price': o['price'],
             'qty': o['qty']
-        } for o in analysis_data['orders'][:5]], indent=2)
+        } for o in analysis_data['orders'][:5]], option=orjson.OPT_INDENT_2).decode()
 
     user_prompt = f"""Analyze this futures portfolio and provide actionable suggestions:
 
@@ -132,13 +376,13 @@ Risk Metrics:
 IMPORTANT: 'Total Positions without Stop Loss' is NOT critical if they are hedged. Focus ONLY on 'CRITICAL Unhedged No-SL Positions' for urgent stop-loss warnings. Hedged positions are considered safe.
 
 Top Positions:
-{json.dumps([{
+{orjson.dumps([{
     'symbol': p['symbol'],
     'side': p['side'],
     'leverage': p['leverage'],
     'liq_distance': f"{p['liquidation_distance_pct']:.2f}%",
     'pnl': p['unrealized_pnl']
-} for p in analysis_data['positions'][:5]], indent=2)}{orders_info}
+} for p in analysis_data['positions'][:5]], option=orjson.OPT_INDENT_2).decode()}{orders_info}
 
 Risk Management:
 - Daily Risk Tolerance: 4% of account equity
@@ -164,19 +408,23 @@ Provide suggestions in JSON format:
             {'role': 'user', 'content': user_prompt}
         ],
         'temperature': 0.7,
-        'max_tokens': 1000
+        'max_tokens': 1000,
+        'stream': True
     }
     
-    response = requests.post(
+    response = _get_session().post(
         'https://api.openai.com/v1/chat/completions',
         headers=headers,
         json=payload,
-        timeout=30
+        timeout=30,
+        stream=True
     )
     response.raise_for_status()
     
-    result = response.json()
-    content = result['choices'][0]['message']['content']
+    content, suggestions = _read_openai_stream(response)
+    if suggestions is not None:
+        _cache_set(cache_key, suggestions)
+        return suggestions
     
     # Try to parse JSON from response
     try:
@@ -186,9 +434,10 @@ Provide suggestions in JSON format:
         elif '```' in content:
             content = content.split('```')[1].split('```')[0].strip()
         
-        suggestions = json.loads(content)
+        suggestions = orjson.loads(content)
+        _cache_set(cache_key, suggestions)
         return suggestions
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         # If parsing fails, use fallback
         return _fallback_analysis(analysis_data)
 
@@ -203,7 +452,10 @@ def _qwen_analysis(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
     Returns:
         Categorized suggestions
     """
-    import requests
+    cache_key = _cache_key('qwen', analysis_data)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
     
     # Prepare prompt (same as OpenAI)
     system_prompt = """You are an expert cryptocurrency futures trading risk analyst. 
@@ -215,13 +467,13 @@ Be concise and specific. Provide 2-4 suggestions per category."""
     
     orders_info = ""
     if analysis_data.get('orders'):
-        orders_info = "\n\nOpen Orders:\n" + json.dumps([{
+        orders_info = "\n\nOpen Orders:\n" + orjson.dumps([{
             'symbol': o['symbol'],
             'side': o['side'],
             'type': o['type'],
             'price': o['price'],
             'qty': o['qty']
-        } for o in analysis_data['orders'][:5]], indent=2)
+        } for o in analysis_data['orders'][:5]], option=orjson.OPT_INDENT_2).decode()
 
     user_prompt = f"""Analyze this futures portfolio and provide actionable suggestions:
 
@@ -243,13 +495,13 @@ Risk Metrics:
 IMPORTANT: 'Total Positions without Stop Loss' is NOT critical if they are hedged. Focus ONLY on 'CRITICAL Unhedged No-SL Positions' for urgent stop-loss warnings. Hedged positions are considered safe.
 
 Top Positions:
-{json.dumps([{
+{orjson.dumps([{
     'symbol': p['symbol'],
     'side': p['side'],
     'leverage': p['leverage'],
     'liq_distance': f"{p['liquidation_distance_pct']:.2f}%",
     'pnl': p['unrealized_pnl']
-} for p in analysis_data['positions'][:5]], indent=2)}{orders_info}
+} for p in analysis_data['positions'][:5]], option=orjson.OPT_INDENT_2).decode()}{orders_info}
 
 Risk Management:
 - Daily Risk Tolerance: 4% of account equity
@@ -281,7 +533,7 @@ Provide suggestions in JSON format:
         }
     }
     
-    response = requests.post(
+    response = _get_session().post(
         'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation',
         headers=headers,
         json=payload,
@@ -302,9 +554,10 @@ Provide suggestions in JSON format:
             elif '```' in content:
                 content = content.split('```')[1].split('```')[0].strip()
             
-            suggestions = json.loads(content)
+            suggestions = orjson.loads(content)
+            _cache_set(cache_key, suggestions)
             return suggestions
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             # If parsing fails, use fallback
             return _fallback_analysis(analysis_data)
     else:
@@ -321,7 +574,10 @@ def _gemini_analysis(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
     Returns:
         Categorized suggestions
     """
-    import requests
+    cache_key = _cache_key('gemini', analysis_data)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
     
     # Prepare prompt (same as others)
     system_prompt = """You are an expert cryptocurrency futures trading risk analyst. 
@@ -333,13 +589,13 @@ Be concise and specific. Provide 2-4 suggestions per category."""
     
     orders_info = ""
     if analysis_data.get('orders'):
-        orders_info = "\n\nOpen Orders:\n" + json.dumps([{
+        orders_info = "\n\nOpen Orders:\n" + orjson.dumps([{
             'symbol': o['symbol'],
             'side': o['side'],
             'type': o['type'],
             'price': o['price'],
             'qty': o['qty']
-        } for o in analysis_data['orders'][:5]], indent=2)
+        } for o in analysis_data['orders'][:5]], option=orjson.OPT_INDENT_2).decode()
 
     user_prompt = f"""Analyze this futures portfolio and provide actionable suggestions:
 
@@ -361,13 +617,13 @@ Risk Metrics:
 IMPORTANT: 'Total Positions without Stop Loss' is NOT critical if they are hedged. Focus ONLY on 'CRITICAL Unhedged No-SL Positions' for urgent stop-loss warnings. Hedged positions are considered safe.
 
 Top Positions:
-{json.dumps([{
+{orjson.dumps([{
     'symbol': p['symbol'],
     'side': p['side'],
     'leverage': p['leverage'],
     'liq_distance': f"{p['liquidation_distance_pct']:.2f}%",
     'pnl': p['unrealized_pnl']
-} for p in analysis_data['positions'][:5]], indent=2)}{orders_info}
+} for p in analysis_data['positions'][:5]], option=orjson.OPT_INDENT_2).decode()}{orders_info}
 
 Risk Management:
 - Daily Risk Tolerance: 4% of account equity
@@ -400,7 +656,7 @@ Provide suggestions in JSON format:
         }
     }
     
-    response = requests.post(
+    response = _get_session().post(
         url,
         headers=headers,
         json=payload,
@@ -424,9 +680,10 @@ Provide suggestions in JSON format:
             elif '```' in content:
                 content = content.split('```')[1].split('```')[0].strip()
                 
-            suggestions = json.loads(content)
+            suggestions = orjson.loads(content)
+            _cache_set(cache_key, suggestions)
             return suggestions
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"⚠️  Gemini JSON parse error: {str(e)}")
             print(f"Raw content: {content[:100]}...")
             return _fallback_analysis(analysis_data)
@@ -444,15 +701,23 @@ def _fallback_analysis(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
     Returns:
         Categorized suggestions
     """
-    urgent = []
-    recommended = []
-    optional = []
-    
     portfolio = analysis_data['portfolio']
     positions = analysis_data['positions']
     orders = analysis_data.get('orders', [])
     risks = analysis_data['risks']
     
+    # Empty portfolio: none of the rules below can fire
+    if not positions and not orders:
+        return {
+            'urgent': [],
+            'recommended': [],
+            'optional': ['No open positions to analyze']
+        }
+    
+    urgent = []
+    recommended = []
+    optional = []
+    
     # URGENT: Close liquidation positions
     close_liq_positions = [
         p for p in positions if p['liquidation_distance_pct'] < 10
@@ -523,7 +788,7 @@ def _fallback_analysis(analysis_data: Dict[str, Any]) -> Dict[str, List[str]]:
         recommended.append(f"You have {len(orders)} open orders. Consider cleaning up old orders.")
     
     # OPTIONAL: Stop losses
-    if any(p['leverage_risk'] in ['medium', 'high'] for p in positions):
+    if any(p['leverage_risk_code'] >= LEVERAGE_RISK_MEDIUM for p in positions):
         optional.append("Set tighter stop losses on high-leverage positions")
     
     # OPTIONAL: Losing positions
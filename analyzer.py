@@ -3,7 +3,12 @@ Position and portfolio analysis engine.
 Computes risk metrics, leverage scores, and exposure analysis.
 """
 
-from typing import Dict, Any, List, Optional
+import math
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 
 
 # Symbol categorization mappings
@@ -15,25 +20,67 @@ SYMBOL_CLUSTERS = {
     'AI': ['AGIX', 'FET', 'RNDR', 'GRT', 'OCEAN', 'NMR', 'TAO'],
 }
 
+# Keyword -> cluster priority (index into _CLUSTER_NAMES; the first cluster
+# listed wins, as in SYMBOL_CLUSTERS order), and a single compiled pattern
+# over every keyword, so a symbol is classified by one regex scan and dict
+# lookups. The lookahead reports a match at every position, including
+# overlapping ones, and alternatives are tried in priority order, so the
+# lowest priority found is the cluster a plain in-order substring check
+# would return.
+_CLUSTER_NAMES = tuple(SYMBOL_CLUSTERS)
+_KEYWORD_PRIORITY = {
+    keyword: priority
+    for priority, keywords in reversed(list(enumerate(SYMBOL_CLUSTERS.values())))
+    for keyword in keywords
+}
+_CLUSTER_RE = re.compile('(?=({}))'.format('|'.join(
+    re.escape(keyword)
+    for keyword in sorted(_KEYWORD_PRIORITY, key=_KEYWORD_PRIORITY.get)
+)))
+
 
+@lru_cache(maxsize=512)
 def categorize_symbol(symbol: str) -> str:
     """
     Categorize a trading symbol into a cluster.
     
+    A symbol containing keywords of several clusters (e.g. 'ETHBTC') gets the
+    one listed first in SYMBOL_CLUSTERS.
+    
     Args:
         symbol: Trading pair symbol (e.g., 'BTCUSDT')
     
     Returns:
         Cluster name (BTC, ETH, L2, MEME, AI, or OTHER)
     """
-    symbol_upper = symbol.upper()
+    priority = min(
+        (_KEYWORD_PRIORITY[m.group(1)] for m in _CLUSTER_RE.finditer(symbol.upper())),
+        default=None
+    )
+    return 'OTHER' if priority is None else _CLUSTER_NAMES[priority]
+
+
+# Labels indexed by the integer codes produced by the numeric kernel
+LEVERAGE_RISK_LABELS = ('safe', 'medium', 'high')
+LEVERAGE_RISK_SAFE, LEVERAGE_RISK_MEDIUM, LEVERAGE_RISK_HIGH = range(3)
+PNL_STATUS_LABELS = ('loss', 'profit')
+
+# Leverage bucket edges for bisect_right: < 5 is safe, 5..10 (inclusive) is
+# medium, anything above 10 is high
+_LEVERAGE_RISK_THRESHOLDS = (5.0, math.nextafter(10.0, math.inf))
+
+
+def _leverage_risk_code(leverage: float) -> int:
+    """
+    Bucket leverage into a risk code.
     
-    for cluster, keywords in SYMBOL_CLUSTERS.items():
-        for keyword in keywords:
-            if keyword in symbol_upper:
-                return cluster
+    Args:
+        leverage: Position leverage
     
-    return 'OTHER'
+    Returns:
+        0 (safe), 1 (medium) or 2 (high), indexing LEVERAGE_RISK_LABELS
+    """
+    return bisect_right(_LEVERAGE_RISK_THRESHOLDS, leverage)
 
 
 def calculate_leverage_risk(leverage: float) -> str:
@@ -46,12 +93,52 @@ def calculate_leverage_risk(leverage: float) -> str:
     Returns:
         Risk level: 'safe', 'medium', or 'high'
     """
-    if leverage < 5:
-        return 'safe'
-    elif leverage <= 10:
-        return 'medium'
+    return LEVERAGE_RISK_LABELS[_leverage_risk_code(leverage)]
+
+
+def _position_metrics(
+    size: float,
+    mark_price: float,
+    liq_price: float,
+    leverage: float,
+    unrealized_pnl: float
+) -> Tuple[float, float, int, int, float]:
+    """
+    Compute the derived risk metrics for one position from pre-parsed numbers.
+    
+    Purely numeric (floats in, floats and int codes out) so it stays a
+    straight-line arithmetic kernel; labels are applied by the caller.
+    
+    Args:
+        size: Position size
+        mark_price: Current mark price
+        liq_price: Liquidation price (0 if none)
+        leverage: Position leverage
+        unrealized_pnl: Unrealized PnL
+    
+    Returns:
+        Tuple of (exposure_usdt, liquidation_distance_pct, pnl_status_code,
+        leverage_risk_code, risk_score)
+    """
+    # Calculate exposure
+    exposure_usdt = abs(size * mark_price)
+    
+    # Calculate liquidation distance
+    if liq_price > 0 and mark_price > 0:
+        liquidation_distance_pct = abs(mark_price - liq_price) / mark_price * 100
     else:
-        return 'high'
+        liquidation_distance_pct = 100.0  # No liquidation risk if no liq price
+    
+    # PnL status: 1 (profit) only for strictly positive PnL
+    pnl_status_code = 1 if unrealized_pnl > 0 else 0
+    
+    # Risk score: inverse of liq distance * leverage (distance floored at 0.1%)
+    risk_score = (100 / max(liquidation_distance_pct, 0.1)) * leverage
+    
+    return (
+        exposure_usdt, liquidation_distance_pct, pnl_status_code,
+        _leverage_risk_code(leverage), risk_score
+    )
 
 
 def analyze_position(position: Dict[str, Any]) -> Dict[str, Any]:
@@ -64,32 +151,22 @@ def analyze_position(position: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Normalized position analysis
     """
-    # Extract fields
+    # Extract fields (each string is parsed exactly once)
     symbol = position.get('symbol', '')
     side = position.get('side', '').lower()
     size = float(position.get('size', 0))
     entry_price = float(position.get('avgPrice', 0))
     mark_price = float(position.get('markPrice', 0))
-    liq_price = float(position.get('liqPrice', 0)) if position.get('liqPrice') else 0
+    liq_price = float(position.get('liqPrice') or 0)
     leverage = float(position.get('leverage', 1))
     unrealized_pnl = float(position.get('unrealisedPnl', 0))
     stop_loss = float(position.get('stopLoss') or 0)
     take_profit = float(position.get('takeProfit') or 0)
     
-    # Calculate exposure
-    exposure_usdt = abs(size * mark_price)
-    
-    # Calculate liquidation distance
-    if liq_price > 0 and mark_price > 0:
-        liquidation_distance_pct = abs(mark_price - liq_price) / mark_price * 100
-    else:
-        liquidation_distance_pct = 100.0  # No liquidation risk if no liq price
-    
-    # Determine PnL status
-    pnl_status = 'profit' if unrealized_pnl > 0 else 'loss'
-    
-    # Calculate leverage risk
-    leverage_risk = calculate_leverage_risk(leverage)
+    (
+        exposure_usdt, liquidation_distance_pct, pnl_status_code,
+        leverage_risk_code, risk_score
+    ) = _position_metrics(size, mark_price, liq_price, leverage, unrealized_pnl)
     
     # Categorize symbol
     cluster = categorize_symbol(symbol)
@@ -107,8 +184,10 @@ def analyze_position(position: Dict[str, Any]) -> Dict[str, Any]:
         'take_profit': take_profit,
         'exposure_usdt': exposure_usdt,
         'liquidation_distance_pct': liquidation_distance_pct,
-        'pnl_status': pnl_status,
-        'leverage_risk': leverage_risk,
+        'pnl_status': PNL_STATUS_LABELS[pnl_status_code],
+        'leverage_risk': LEVERAGE_RISK_LABELS[leverage_risk_code],
+        'leverage_risk_code': leverage_risk_code,
+        'risk_score': risk_score,
         'cluster': cluster
     }
 
@@ -136,6 +215,10 @@ def analyze_orders(orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return analyzed_orders
 
 
+# Exposure sign per position side; anything else contributes nothing
+_SIDE_SIGN = {'buy': 1.0, 'sell': -1.0}
+
+
 def analyze_portfolio(positions: List[Dict[str, Any]], orders: List[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Analyze entire portfolio and compute aggregate metrics.
@@ -175,15 +258,49 @@ def analyze_portfolio(positions: List[Dict[str, Any]], orders: List[Dict[str, An
             }
         }
     
-    # Calculate exposures
-    total_long_exposure = sum(
-        pos['exposure_usdt'] for pos in positions if pos['side'] == 'buy'
-    )
-    total_short_exposure = sum(
-        pos['exposure_usdt'] for pos in positions if pos['side'] == 'sell'
-    )
-    net_exposure = total_long_exposure - total_short_exposure
-    total_exposure = total_long_exposure + total_short_exposure
+    # Aggregate every per-position metric in a single pass
+    gross_exposure = 0.0
+    net_exposure = 0.0
+    total_unrealized_pnl = 0.0
+    cluster_exposure = defaultdict(float)
+    high_leverage_count = 0
+    close_liquidation_count = 0
+    no_stop_loss_positions = []
+    symbol_sides = defaultdict(set)
+    highest_risk_position = None
+    highest_risk_score = 0
+    
+    for pos in positions:
+        exposure = pos['exposure_usdt']
+        side = pos['side']
+        sign = _SIDE_SIGN.get(side, 0.0)
+        gross_exposure += abs(sign) * exposure
+        net_exposure += sign * exposure
+        
+        cluster_exposure[pos['cluster']] += exposure
+        total_unrealized_pnl += pos['unrealized_pnl']
+        
+        if pos['leverage_risk_code'] == LEVERAGE_RISK_HIGH:
+            high_leverage_count += 1
+        liq_distance = pos['liquidation_distance_pct']
+        if liq_distance < 10:
+            close_liquidation_count += 1
+        
+        # Check for positions without Stop Loss
+        if pos['stop_loss'] == 0:
+            no_stop_loss_positions.append(pos)
+        
+        symbol_sides[pos['symbol']].add(side)
+        
+        # Track highest risk position (high leverage + close liquidation)
+        if pos['risk_score'] > highest_risk_score:
+            highest_risk_score = pos['risk_score']
+            highest_risk_position = pos
+    
+    # Recover the per-side totals from the gross and net sums
+    total_long_exposure = (gross_exposure + net_exposure) / 2
+    total_short_exposure = (gross_exposure - net_exposure) / 2
+    total_exposure = gross_exposure
     
     # Determine bias
     if total_exposure > 0:
@@ -197,42 +314,13 @@ def analyze_portfolio(positions: List[Dict[str, Any]], orders: List[Dict[str, An
     else:
         bias = 'neutral'
     
-    # Calculate cluster distribution
-    cluster_exposure = {}
-    for pos in positions:
-        cluster = pos['cluster']
-        cluster_exposure[cluster] = cluster_exposure.get(cluster, 0) + pos['exposure_usdt']
-    
-    # Convert to percentages
+    # Convert cluster exposure to percentages
     cluster_distribution = {}
     if total_exposure > 0:
         for cluster, exposure in cluster_exposure.items():
             cluster_distribution[cluster] = (exposure / total_exposure) * 100
     
-    # Calculate total unrealized PnL
-    total_unrealized_pnl = sum(pos['unrealized_pnl'] for pos in positions)
-    
-    # Risk analysis
-    high_leverage_positions = [
-        pos for pos in positions if pos['leverage_risk'] == 'high'
-    ]
-    close_liquidation_positions = [
-        pos for pos in positions if pos['liquidation_distance_pct'] < 10
-    ]
-    
-    # Check for positions without Stop Loss
-    no_stop_loss_positions = [
-        pos for pos in positions if pos['stop_loss'] == 0
-    ]
-    
     # Check for hedged positions (opposite open)
-    symbol_sides = {}
-    for pos in positions:
-        sym = pos['symbol']
-        if sym not in symbol_sides:
-            symbol_sides[sym] = set()
-        symbol_sides[sym].add(pos['side'])
-    
     hedged_symbols = [sym for sym, sides in symbol_sides.items() if 'buy' in sides and 'sell' in sides]
 
     # Check for opposite orders (potential hedges)
@@ -255,18 +343,6 @@ def analyze_portfolio(positions: List[Dict[str, Any]], orders: List[Dict[str, An
             
         risky_positions.append(pos)
     
-    # Find highest risk position (combination of high leverage and close liquidation)
-    highest_risk_position = None
-    highest_risk_score = 0
-    
-    for pos in positions:
-        # Risk score: inverse of liq distance * leverage
-        if pos['liquidation_distance_pct'] > 0:
-            risk_score = (100 / pos['liquidation_distance_pct']) * pos['leverage']
-            if risk_score > highest_risk_score:
-                highest_risk_score = risk_score
-                highest_risk_position = pos
-    
     return {
         'portfolio': {
             'total_long_exposure': total_long_exposure,
@@ -282,8 +358,8 @@ def analyze_portfolio(positions: List[Dict[str, Any]], orders: List[Dict[str, An
         'orders': orders,
         'risks': {
             'highest_risk_position': highest_risk_position,
-            'high_leverage_count': len(high_leverage_positions),
-            'close_liquidation_count': len(close_liquidation_positions),
+            'high_leverage_count': high_leverage_count,
+            'close_liquidation_count': close_liquidation_count,
             'no_stop_loss_count': len(no_stop_loss_positions),
             'no_stop_loss_positions': no_stop_loss_positions,
             'risky_positions': risky_positions,
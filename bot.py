@@ -8,11 +8,11 @@ Usage:
 """
 
 import sys
-from typing import Dict, Any
+import time
+from collections import namedtuple
+from operator import itemgetter
+from typing import Dict, Any, List
 from config import Config
-import bybit_api
-import analyzer
-import ai_analysis
 
 
 def format_currency(amount: float) -> str:
@@ -25,97 +25,138 @@ def format_percentage(value: float) -> str:
     return f"{value:.2f}%"
 
 
+# Whole per-position block of the risk report, formatted in a single call
+# (same number formats as format_currency / format_percentage)
+_POSITION_RISK_TEMPLATE = (
+    "\n{emoji} [{risk} RISK] {p[symbol]} ({side})\n"
+    "  Size: {p[size]:.4f} | Entry: ${p[entry_price]:,.2f} | Mark: ${p[mark_price]:,.2f}\n"
+    "  Leverage: {p[leverage]:.1f}x | Liq Price: ${p[liq_price]:,.2f}\n"
+    "  Distance to Liquidation: {p[liquidation_distance_pct]:.2f}%\n"
+    "  PnL: {sign}${p[unrealized_pnl]:,.2f} ({p[pnl_status]})\n"
+    "  Exposure: ${p[exposure_usdt]:,.2f} USDT | Cluster: {p[cluster]}"
+)
+
+# A position row for the `list` table with every numeric field parsed once
+ListRow = namedtuple('ListRow', 'symbol side size entry mark value pnl lev')
+
+# One row of the `list` table, formatted in a single call per position
+_LIST_ROW_TEMPLATE = (
+    "{r.symbol:<15} {r.side:<6} {r.size:<15,.4f} ${r.entry:<11,.4f} ${r.mark:<11,.4f} "
+    "${r.value:<14,.2f} {ind} {pnl:<13} {r.lev:.1f}x"
+)
+
+
+def parse_list_row(pos: Dict[str, Any]) -> ListRow:
+    """Convert a raw Bybit position into a ListRow (floats parsed once)."""
+    size = float(pos.get('size', 0))
+    mark_price = float(pos.get('markPrice', 0))
+    return ListRow(
+        symbol=pos.get('symbol', 'N/A'),
+        side=pos.get('side', 'N/A'),
+        size=size,
+        entry=float(pos.get('avgPrice', 0)),
+        mark=mark_price,
+        value=size * mark_price,  # position value (size * mark price)
+        pnl=float(pos.get('unrealisedPnl', 0)),
+        lev=float(pos.get('leverage', 0))
+    )
+
+
+# Order types listed in the stop/conditional section of `orders`
+_STOP_ORDER_TYPES = frozenset({'Stop', 'StopLimit'})
+
+# Emoji per leverage risk level
+_RISK_EMOJI = {
+    'high': '🔴',
+    'medium': '🟡',
+    'safe': '🟢'
+}
+
+
 def get_risk_emoji(risk_level: str) -> str:
     """Get emoji for risk level."""
-    return {
-        'high': '🔴',
-        'medium': '🟡',
-        'safe': '🟢'
-    }.get(risk_level, '⚪')
+    return _RISK_EMOJI.get(risk_level, '⚪')
 
 
-def print_portfolio_summary(analysis: Dict[str, Any]) -> None:
-    """Print portfolio summary section."""
+def print_portfolio_summary(analysis: Dict[str, Any], out: List[str]) -> None:
+    """Append portfolio summary section lines to the output buffer."""
     portfolio = analysis['portfolio']
     
-    print("\n" + "=" * 60)
-    print("PORTFOLIO SUMMARY".center(60))
-    print("=" * 60)
+    out.append("\n" + "=" * 60)
+    out.append("PORTFOLIO SUMMARY".center(60))
+    out.append("=" * 60)
     
-    print(f"\nLong Exposure:  ${format_currency(portfolio['total_long_exposure'])} USDT")
-    print(f"Short Exposure: ${format_currency(portfolio['total_short_exposure'])} USDT")
-    print(f"Net Exposure:   ${format_currency(portfolio['net_exposure'])} USDT")
-    print(f"Total PnL:      ${format_currency(portfolio['total_unrealized_pnl'])} USDT")
-    print(f"Bias:           {portfolio['bias'].upper()}")
-    print(f"Total Positions: {portfolio['total_positions']}")
+    out.append(f"\nLong Exposure:  ${format_currency(portfolio['total_long_exposure'])} USDT")
+    out.append(f"Short Exposure: ${format_currency(portfolio['total_short_exposure'])} USDT")
+    out.append(f"Net Exposure:   ${format_currency(portfolio['net_exposure'])} USDT")
+    out.append(f"Total PnL:      ${format_currency(portfolio['total_unrealized_pnl'])} USDT")
+    out.append(f"Bias:           {portfolio['bias'].upper()}")
+    out.append(f"Total Positions: {portfolio['total_positions']}")
     
     if portfolio['clusters']:
-        print("\nCluster Distribution:")
+        out.append("\nCluster Distribution:")
         sorted_clusters = sorted(
             portfolio['clusters'].items(),
             key=lambda x: x[1],
             reverse=True
         )
         for cluster, pct in sorted_clusters:
-            print(f"  {cluster:8s} {format_percentage(pct)}")
+            out.append(f"  {cluster:8s} {format_percentage(pct)}")
 
 
-def print_position_risks(analysis: Dict[str, Any]) -> None:
-    """Print individual position risks."""
+def print_position_risks(analysis: Dict[str, Any], out: List[str]) -> None:
+    """Append individual position risk lines to the output buffer."""
     positions = analysis['positions']
     
     if not positions:
-        print("\nNo open positions found.")
+        out.append("\nNo open positions found.")
         return
     
-    print("\n" + "=" * 60)
-    print("POSITION RISKS".center(60))
-    print("=" * 60)
+    out.append("\n" + "=" * 60)
+    out.append("POSITION RISKS".center(60))
+    out.append("=" * 60)
     
-    # Sort by risk score (leverage * inverse liq distance)
-    sorted_positions = sorted(
-        positions,
-        key=lambda p: (100 / max(p['liquidation_distance_pct'], 0.1)) * p['leverage'],
-        reverse=True
-    )
+    # Sort by precomputed risk score (leverage * inverse liq distance)
+    sorted_positions = sorted(positions, key=itemgetter('risk_score'), reverse=True)
     
     for pos in sorted_positions:
         risk_emoji = get_risk_emoji(pos['leverage_risk'])
         side_display = pos['side'].upper()
         pnl_sign = '+' if pos['unrealized_pnl'] >= 0 else ''
         
-        print(f"\n{risk_emoji} [{pos['leverage_risk'].upper()} RISK] {pos['symbol']} ({side_display})")
-        print(f"  Size: {pos['size']:.4f} | Entry: ${format_currency(pos['entry_price'])} | Mark: ${format_currency(pos['mark_price'])}")
-        print(f"  Leverage: {pos['leverage']:.1f}x | Liq Price: ${format_currency(pos['liq_price'])}")
-        print(f"  Distance to Liquidation: {format_percentage(pos['liquidation_distance_pct'])}")
-        print(f"  PnL: {pnl_sign}${format_currency(pos['unrealized_pnl'])} ({pos['pnl_status']})")
-        print(f"  Exposure: ${format_currency(pos['exposure_usdt'])} USDT | Cluster: {pos['cluster']}")
+        out.append(_POSITION_RISK_TEMPLATE.format(
+            p=pos,
+            emoji=risk_emoji,
+            risk=pos['leverage_risk'].upper(),
+            side=side_display,
+            sign=pnl_sign
+        ))
         
         # Add warning for high-risk positions
         if pos['leverage_risk'] == 'high' and pos['liquidation_distance_pct'] < 15:
-            print(f"  ⚠️  HIGH RISK: High leverage + close to liquidation!")
+            out.append(f"  ⚠️  HIGH RISK: High leverage + close to liquidation!")
 
 
-def print_suggestions(suggestions: Dict[str, Any]) -> None:
-    """Print AI-generated suggestions."""
-    print("\n" + "=" * 60)
-    print("ACTIONABLE SUGGESTIONS".center(60))
-    print("=" * 60)
+def print_suggestions(suggestions: Dict[str, Any], out: List[str]) -> None:
+    """Append AI-generated suggestion lines to the output buffer."""
+    out.append("\n" + "=" * 60)
+    out.append("ACTIONABLE SUGGESTIONS".center(60))
+    out.append("=" * 60)
     
     if suggestions.get('urgent'):
-        print("\n🔴 URGENT:")
+        out.append("\n🔴 URGENT:")
         for suggestion in suggestions['urgent']:
-            print(f"  - {suggestion}")
+            out.append(f"  - {suggestion}")
     
     if suggestions.get('recommended'):
-        print("\n🟡 RECOMMENDED:")
+        out.append("\n🟡 RECOMMENDED:")
         for suggestion in suggestions['recommended']:
-            print(f"  - {suggestion}")
+            out.append(f"  - {suggestion}")
     
     if suggestions.get('optional'):
-        print("\n🟢 OPTIONAL:")
+        out.append("\n🟢 OPTIONAL:")
         for suggestion in suggestions['optional']:
-            print(f"  - {suggestion}")
+            out.append(f"  - {suggestion}")
 
 
 def list_positions_command() -> int:
@@ -137,6 +178,10 @@ def list_positions_command() -> int:
         print("  - BYBIT_API_SECRET")
         return 1
     
+    # Heavy modules (requests via bybit_api) are imported only by the commands
+    # that need them, so usage/help output starts instantly
+    import bybit_api
+    
     print("\n📡 Fetching positions from Bybit...")
     
     try:
@@ -149,44 +194,35 @@ def list_positions_command() -> int:
         
         print(f"✅ Found {len(raw_positions)} open position(s)\n")
         
-        # Print header
-        print("=" * 120)
-        print(f"{'SYMBOL':<15} {'SIDE':<6} {'SIZE':<15} {'ENTRY':<12} {'MARK':<12} {'AMOUNT':<15} {'PNL':<15} {'LEV':<5}")
-        print("=" * 120)
-        
-        # Sort by symbol
-        sorted_positions = sorted(raw_positions, key=lambda p: p.get('symbol', ''))
+        # Build the table and write it in one go
+        out: List[str] = ["=" * 120]
+        out.append(f"{'SYMBOL':<15} {'SIDE':<6} {'SIZE':<15} {'ENTRY':<12} {'MARK':<12} {'AMOUNT':<15} {'PNL':<15} {'LEV':<5}")
+        out.append("=" * 120)
         
-        total_pnl = 0.0
-        total_amount = 0.0
+        # Parse once, sorted by symbol
+        rows = [
+            parse_list_row(pos)
+            for pos in sorted(raw_positions, key=lambda p: p.get('symbol', ''))
+        ]
         
-        for pos in sorted_positions:
-            symbol = pos.get('symbol', 'N/A')
-            side = pos.get('side', 'N/A')
-            size = float(pos.get('size', 0))
-            entry_price = float(pos.get('avgPrice', 0))
-            mark_price = float(pos.get('markPrice', 0))
-            unrealized_pnl = float(pos.get('unrealisedPnl', 0))
-            leverage = float(pos.get('leverage', 0))
-            
-            # Calculate position value (size * mark price)
-            position_value = size * mark_price
-            
-            total_pnl += unrealized_pnl
-            total_amount += position_value
-            
+        for row in rows:
             # Format PnL with color indicator
-            pnl_sign = '+' if unrealized_pnl >= 0 else ''
-            pnl_str = f"{pnl_sign}${unrealized_pnl:,.2f}"
-            pnl_indicator = "🟢" if unrealized_pnl >= 0 else "🔴"
-            
-            print(f"{symbol:<15} {side:<6} {size:<15,.4f} ${entry_price:<11,.4f} ${mark_price:<11,.4f} ${position_value:<14,.2f} {pnl_indicator} {pnl_str:<13} {leverage:.1f}x")
+            pnl_sign = '+' if row.pnl >= 0 else ''
+            out.append(_LIST_ROW_TEMPLATE.format(
+                r=row,
+                ind="🟢" if row.pnl >= 0 else "🔴",
+                pnl=f"{pnl_sign}${row.pnl:,.2f}"
+            ))
+        
+        total_pnl = sum(row.pnl for row in rows)
+        total_amount = sum(row.value for row in rows)
         
-        print("=" * 120)
+        out.append("=" * 120)
         total_sign = '+' if total_pnl >= 0 else ''
-        print(f"\n💰 Total Position Value: ${total_amount:,.2f} USDT")
-        print(f"💰 Total Unrealized PnL: {total_sign}${total_pnl:,.2f} USDT")
-        print("\n" + "=" * 60 + "\n")
+        out.append(f"\n💰 Total Position Value: ${total_amount:,.2f} USDT")
+        out.append(f"💰 Total Unrealized PnL: {total_sign}${total_pnl:,.2f} USDT")
+        out.append("\n" + "=" * 60 + "\n")
+        sys.stdout.write("\n".join(out) + "\n")
         
         return 0
     
@@ -214,6 +250,8 @@ def orders_command() -> int:
         print("  - BYBIT_API_SECRET")
         return 1
     
+    import bybit_api
+    
     print("\n📡 Fetching orders from Bybit...")
     
     try:
@@ -226,28 +264,32 @@ def orders_command() -> int:
         
         print(f"✅ Found {len(all_orders)} open order(s)\n")
         
-        # Group orders by type
+        # Group orders by type in one pass, then sort each group by symbol
         limit_orders = []
         stop_orders = []
         
         for order in all_orders:
-            order_type = order.get('orderType', '')
-            stop_order_type = order.get('stopOrderType', '')
-            
-            if stop_order_type or order_type in ['Stop', 'StopLimit']:
+            if order.get('stopOrderType') or order.get('orderType') in _STOP_ORDER_TYPES:
                 stop_orders.append(order)
             else:
                 limit_orders.append(order)
         
+        by_symbol = itemgetter('symbol')
+        limit_orders.sort(key=by_symbol)
+        stop_orders.sort(key=by_symbol)
+        
+        # Build both sections and write them in one go
+        out: List[str] = []
+        
         # Display Limit Orders
         if limit_orders:
-            print("=" * 130)
-            print("📊 LIMIT ORDERS".center(130))
-            print("=" * 130)
-            print(f"{'SYMBOL':<15} {'SIDE':<6} {'TYPE':<12} {'QTY':<15} {'PRICE':<15} {'STATUS':<12} {'TIME CREATED':<20}")
-            print("=" * 130)
+            out.append("=" * 130)
+            out.append("📊 LIMIT ORDERS".center(130))
+            out.append("=" * 130)
+            out.append(f"{'SYMBOL':<15} {'SIDE':<6} {'TYPE':<12} {'QTY':<15} {'PRICE':<15} {'STATUS':<12} {'TIME CREATED':<20}")
+            out.append("=" * 130)
             
-            for order in sorted(limit_orders, key=lambda o: o.get('symbol', '')):
+            for order in limit_orders:
                 symbol = order.get('symbol', 'N/A')
                 side = order.get('side', 'N/A')
                 order_type = order.get('orderType', 'N/A')
@@ -258,21 +300,20 @@ def orders_command() -> int:
                 
                 # Convert timestamp to readable format
                 if created_time != 'N/A':
-                    from datetime import datetime
-                    created_time = datetime.fromtimestamp(int(created_time) / 1000).strftime('%Y-%m-%d %H:%M:%S')
+                    created_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(created_time) // 1000))
                 
                 side_emoji = "🟢" if side == "Buy" else "🔴"
-                print(f"{symbol:<15} {side_emoji} {side:<4} {order_type:<12} {qty:<15,.4f} ${price:<14,.4f} {status:<12} {created_time:<20}")
+                out.append(f"{symbol:<15} {side_emoji} {side:<4} {order_type:<12} {qty:<15,.4f} ${price:<14,.4f} {status:<12} {created_time:<20}")
         
         # Display Stop/Conditional Orders
         if stop_orders:
-            print("\n" + "=" * 130)
-            print("🎯 STOP LOSS / TAKE PROFIT ORDERS".center(130))
-            print("=" * 130)
-            print(f"{'SYMBOL':<15} {'SIDE':<6} {'TYPE':<15} {'QTY':<15} {'TRIGGER':<15} {'PRICE':<15} {'STATUS':<12}")
-            print("=" * 130)
+            out.append("\n" + "=" * 130)
+            out.append("🎯 STOP LOSS / TAKE PROFIT ORDERS".center(130))
+            out.append("=" * 130)
+            out.append(f"{'SYMBOL':<15} {'SIDE':<6} {'TYPE':<15} {'QTY':<15} {'TRIGGER':<15} {'PRICE':<15} {'STATUS':<12}")
+            out.append("=" * 130)
             
-            for order in sorted(stop_orders, key=lambda o: o.get('symbol', '')):
+            for order in stop_orders:
                 symbol = order.get('symbol', 'N/A')
                 side = order.get('side', 'N/A')
                 stop_order_type = order.get('stopOrderType', order.get('orderType', 'N/A'))
@@ -286,9 +327,10 @@ def orders_command() -> int:
                 # Determine if it's SL or TP based on side and trigger
                 order_label = stop_order_type
                 
-                print(f"{symbol:<15} {side_emoji} {side:<4} {order_label:<15} {qty:<15,.4f} ${trigger_price:<14,.4f} ${price:<14,.4f} {status:<12}")
+                out.append(f"{symbol:<15} {side_emoji} {side:<4} {order_label:<15} {qty:<15,.4f} ${trigger_price:<14,.4f} ${price:<14,.4f} {status:<12}")
         
-        print("\n" + "=" * 60 + "\n")
+        out.append("\n" + "=" * 60 + "\n")
+        sys.stdout.write("\n".join(out) + "\n")
         
         return 0
     
@@ -320,17 +362,22 @@ def analyze_command() -> int:
         print("  export BYBIT_API_SECRET='your_secret_here'")
         return 1
     
-    # Check OpenAI status
-    if Config.has_openai():
-        print("✅ OpenAI API configured - AI analysis enabled")
+    # Resolve the AI provider once and reuse it for the suggestions step
+    ai_provider = Config.get_ai_provider()
+    if ai_provider:
+        print(f"✅ AI provider configured ({ai_provider}) - AI analysis enabled")
     else:
         print("ℹ️  OpenAI API not configured - using rule-based analysis")
     
+    import bybit_api
+    import analyzer
+    import ai_analysis
+    
     print("\n📡 Fetching positions from Bybit...")
     
     try:
-        # Fetch positions
-        raw_positions = bybit_api.get_positions()
+        # Fetch positions and open orders in parallel
+        raw_positions, raw_orders = bybit_api.get_positions_and_orders()
         print(f"✅ Found {len(raw_positions)} open position(s)")
         
         if not raw_positions:
@@ -339,20 +386,22 @@ def analyze_command() -> int:
         
         # Analyze positions
         print("🔍 Analyzing positions...")
-        analysis = analyzer.analyze_positions(raw_positions)
+        analysis = analyzer.analyze_positions(raw_positions, raw_orders)
         
         # Get AI suggestions
         print("🧠 Generating suggestions...")
-        suggestions = ai_analysis.analyze_with_ai(analysis)
+        suggestions = ai_analysis.analyze_with_ai(analysis, provider=ai_provider)
         
-        # Print report
-        print_portfolio_summary(analysis)
-        print_position_risks(analysis)
-        print_suggestions(suggestions)
+        # Build the full report and write it in one go
+        out: List[str] = []
+        print_portfolio_summary(analysis, out)
+        print_position_risks(analysis, out)
+        print_suggestions(suggestions, out)
         
-        print("\n" + "=" * 60)
-        print("✅ Analysis complete!")
-        print("=" * 60 + "\n")
+        out.append("\n" + "=" * 60)
+        out.append("✅ Analysis complete!")
+        out.append("=" * 60 + "\n")
+        sys.stdout.write("\n".join(out) + "\n")
         
         return 0
     
@@ -4,16 +4,50 @@ Handles authentication and position data retrieval.
 """
 
 import hmac
-import hashlib
 import time
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import urllib.parse
-from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterator, Optional, List, Tuple
 try:
     from .config import Config
+    from .cache import ttl_cache
 except ImportError:
     from config import Config
+    from cache import ttl_cache
+
+_MS_PER_DAY = 24 * 60 * 60 * 1000
+
+# Receive window header/signature value (constant for the process)
+_RECV_WINDOW_STR = str(Config.RECV_WINDOW)
+
+# Shared HTTP session: keeps TCP/TLS connections to Bybit alive across calls
+_session = requests.Session()
+_session.headers.update({'Content-Type': 'application/json'})
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# GET retries on rate limits, transient 5xx errors and failed connections.
+# They live in signed_request rather than in urllib3 so every attempt gets a
+# fresh timestamp and signature; a replayed one would fall outside the recv
+# window. Read timeouts are not retried to bound how long a call can block.
+_MAX_ATTEMPTS = 3
+_RETRY_BACKOFF = 0.2  # seconds, doubled after each retry
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+
+def close_session() -> None:
+    """Close pooled connections to Bybit (call on application shutdown)."""
+    _session.close()
+
+
+@lru_cache(maxsize=4)
+def _secret_key(api_secret: str) -> bytes:
+    """Encode the API secret once for HMAC signing."""
+    return api_secret.encode('utf-8')
 
 
 def generate_signature(params: str, timestamp: str, api_secret: str, recv_window: str) -> str:
@@ -30,11 +64,22 @@ def generate_signature(params: str, timestamp: str, api_secret: str, recv_window
         Hex-encoded signature string
     """
     param_str = f"{timestamp}{Config.BYBIT_API_KEY}{recv_window}{params}"
-    return hmac.new(
-        api_secret.encode('utf-8'),
-        param_str.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
+    # One-shot OpenSSL HMAC (no Python-level HMAC object)
+    return hmac.digest(_secret_key(api_secret), param_str.encode('utf-8'), 'sha256').hex()
+
+
+def start_of_day_ms() -> int:
+    """
+    Get the start of the current UTC day as a Bybit timestamp.
+    
+    Epoch time has no leap seconds, so UTC midnight is simply the current
+    time floored to a whole day - no datetime objects needed.
+    
+    Returns:
+        Milliseconds since the epoch at 00:00 UTC today
+    """
+    now_ms = int(time.time() * 1000)
+    return now_ms - now_ms % _MS_PER_DAY
 
 
 def signed_request(
@@ -59,51 +104,59 @@ def signed_request(
     if params is None:
         params = {}
     
-    # Generate timestamp
-    timestamp = str(int(time.time() * 1000))
-    recv_window = str(Config.RECV_WINDOW)
+    method = method.upper()
+    if method not in ('GET', 'POST'):
+        raise ValueError(f"Unsupported HTTP method: {method}")
+    recv_window = _RECV_WINDOW_STR
     
     # Build query string for GET requests (use raw values for signature)
-    if method.upper() == 'GET':
-        # Build query string with proper encoding
-        # Sort parameters alphabetically
-        sorted_params = sorted(params.items())
-        query_parts = []
-        for k, v in sorted_params:
-            # Don't URL-encode for signature - use raw values
-            query_parts.append(f"{k}={v}")
-        query_string = '&'.join(query_parts)
+    if method == 'GET' and params:
+        # Sort parameters alphabetically. Values are NOT URL-encoded: Bybit
+        # returns pagination cursors already encoded, and the signature must
+        # cover the exact string that is sent.
+        query_string = '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
     else:
         query_string = ''
     
-    # Generate signature
-    signature = generate_signature(query_string, timestamp, Config.BYBIT_API_SECRET, recv_window)
-    
-    # Build headers
-    headers = {
-        'X-BAPI-API-KEY': Config.BYBIT_API_KEY,
-        'X-BAPI-SIGN': signature,
-        'X-BAPI-TIMESTAMP': timestamp,
-        'X-BAPI-RECV-WINDOW': recv_window,
-        'Content-Type': 'application/json'
-    }
-    
-    # Make request
     url = f"{Config.BYBIT_BASE_URL}{endpoint}"
+    # Build URL manually with query string to avoid double-encoding
+    if query_string:
+        url = f"{url}?{query_string}"
+    
+    # POST changes account state, so it is never replayed
+    attempts = _MAX_ATTEMPTS if method == 'GET' else 1
     
     try:
-        if method.upper() == 'GET':
-            # Build URL manually with query string to avoid double-encoding
-            if query_string:
-                url = f"{url}?{query_string}"
-            response = requests.get(url, headers=headers, timeout=10)
-        elif method.upper() == 'POST':
-            response = requests.post(url, json=params, headers=headers, timeout=10)
-        else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(_RETRY_BACKOFF * 2 ** (attempt - 1))
+            is_last = attempt == attempts - 1
+            
+            # Sign each attempt with its own timestamp
+            timestamp = str(int(time.time() * 1000))
+            signature = generate_signature(query_string, timestamp, Config.BYBIT_API_SECRET, recv_window)
+            headers = {
+                'X-BAPI-API-KEY': Config.BYBIT_API_KEY,
+                'X-BAPI-SIGN': signature,
+                'X-BAPI-TIMESTAMP': timestamp,
+                'X-BAPI-RECV-WINDOW': recv_window
+            }
+            
+            try:
+                if method == 'GET':
+                    response = _session.get(url, headers=headers, timeout=_TIMEOUT)
+                else:
+                    response = _session.post(url, json=params, headers=headers, timeout=_TIMEOUT)
+            except requests.exceptions.ConnectionError:
+                if is_last:
+                    raise
+                continue
+            
+            if response.status_code not in _RETRY_STATUSES or is_last:
+                break
         
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         
         # Check Bybit API response code
         if data.get('retCode') != 0:
@@ -112,10 +165,47 @@ def signed_request(
         
         return data
     
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         raise Exception(f"API request failed: {str(e)}")
 
 
+def _paginate(
+    endpoint: str,
+    params: Dict[str, Any],
+    max_items: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every item of a cursor-paginated Bybit list endpoint.
+    
+    Args:
+        endpoint: API endpoint path
+        params: Query parameters for the first page (not modified)
+        max_items: Stop requesting further pages once more than this many
+            items have been yielded (None for no limit)
+    
+    Yields:
+        Items from each page's result list, in API order
+    
+    Raises:
+        Exception: If an API request fails
+    """
+    params = dict(params)
+    count = 0
+    
+    while True:
+        response = signed_request('GET', endpoint, params)
+        result = response.get('result', {})
+        items = result.get('list', [])
+        yield from items
+        count += len(items)
+        
+        # Check if there are more pages
+        cursor = result.get('nextPageCursor')
+        if not cursor or (max_items is not None and count > max_items):
+            break
+        params['cursor'] = cursor
+
+
 def get_tickers(category: str = 'linear', symbol: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Fetch market tickers (price, funding rate, etc).
@@ -144,10 +234,26 @@ def get_tickers(category: str = 'linear', symbol: Optional[str] = None) -> List[
         raise Exception(f"Failed to fetch tickers: {str(e)}")
 
 
+# Seconds a positions/orders snapshot is reused (e.g. `list` then `analyze` in
+# one process, or several bot handlers in quick succession)
+POSITIONS_CACHE_TTL = 2.0
+
+# Seconds balance and closed PnL results are reused; they change only on fills,
+# which call invalidate_caches()
+ACCOUNT_CACHE_TTL = 5.0
+
+# Size strings Bybit uses for flat (closed) position slots
+_ZERO_SIZES = frozenset({'0', '0.0', '0.00000000', ''})
+
+
+@ttl_cache(POSITIONS_CACHE_TTL)
 def get_positions(category: str = 'linear', settle_coin: str = 'USDT') -> List[Dict[str, Any]]:
     """
     Fetch all open positions from Bybit with pagination support.
     
+    Results are cached for POSITIONS_CACHE_TTL seconds; the returned list is
+    a fresh copy but the position dicts are shared and must not be mutated.
+    
     Args:
         category: Product type ('linear' for USDT perpetuals)
         settle_coin: Settlement coin (USDT, USDC, etc.)
@@ -159,51 +265,32 @@ def get_positions(category: str = 'linear', settle_coin: str = 'USDT') -> List[D
         Exception: If API request fails
     """
     endpoint = '/v5/position/list'
-    all_positions = []
-    cursor = None
     
     try:
-        # Loop through all pages
-        while True:
-            params = {
-                'category': category,
-                'settleCoin': settle_coin
-            }
-            
-            # Add cursor for pagination (if not first request)
-            if cursor:
-                params['cursor'] = cursor
-            
-            response = signed_request('GET', endpoint, params)
-            
-            # Extract positions from response
-            result = response.get('result', {})
-            positions = result.get('list', [])
-            
-            # Add positions to our list
-            all_positions.extend(positions)
-            
-            # Check if there are more pages
-            cursor = result.get('nextPageCursor')
-            if not cursor:
-                break
+        params = {
+            'category': category,
+            'settleCoin': settle_coin
+        }
         
-        # Filter only positions with non-zero size
-        open_positions = [
-            pos for pos in all_positions
-            if float(pos.get('size', 0)) > 0
+        # Filter only positions with non-zero size (common zero strings are
+        # rejected without parsing)
+        return [
+            pos for pos in _paginate(endpoint, params)
+            if pos.get('size', '0') not in _ZERO_SIZES and float(pos['size']) > 0
         ]
-        
-        return open_positions
     
     except Exception as e:
         raise Exception(f"Failed to fetch positions: {str(e)}")
 
 
+@ttl_cache(POSITIONS_CACHE_TTL)
 def get_open_orders(category: str = 'linear', settle_coin: str = 'USDT') -> List[Dict[str, Any]]:
     """
     Fetch all open orders from Bybit (limit, market, conditional orders).
     
+    Results are cached for POSITIONS_CACHE_TTL seconds; the order dicts are
+    shared and must not be mutated.
+    
     Args:
         category: Product type ('linear' for USDT perpetuals)
         settle_coin: Settlement coin (USDT, USDC, etc.)
@@ -215,41 +302,45 @@ def get_open_orders(category: str = 'linear', settle_coin: str = 'USDT') -> List
         Exception: If API request fails
     """
     endpoint = '/v5/order/realtime'
-    all_orders = []
-    cursor = None
     
     try:
-        # Loop through all pages
-        while True:
-            params = {
-                'category': category,
-                'settleCoin': settle_coin
-            }
-            
-            # Add cursor for pagination (if not first request)
-            if cursor:
-                params['cursor'] = cursor
-            
-            response = signed_request('GET', endpoint, params)
-            
-            # Extract orders from response
-            result = response.get('result', {})
-            orders = result.get('list', [])
-            
-            # Add orders to our list
-            all_orders.extend(orders)
-            
-            # Check if there are more pages
-            cursor = result.get('nextPageCursor')
-            if not cursor:
-                break
-        
-        return all_orders
+        params = {
+            'category': category,
+            'settleCoin': settle_coin
+        }
+        return list(_paginate(endpoint, params))
     
     except Exception as e:
         raise Exception(f"Failed to fetch open orders: {str(e)}")
 
 
+def get_positions_and_orders(
+    category: str = 'linear',
+    settle_coin: str = 'USDT'
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Fetch open positions and open orders concurrently.
+    
+    Both endpoints are independent and network-bound, so they are requested
+    in parallel threads and the total wait is the slower of the two rather
+    than their sum.
+    
+    Args:
+        category: Product type ('linear' for USDT perpetuals)
+        settle_coin: Settlement coin (USDT, USDC, etc.)
+    
+    Returns:
+        Tuple of (positions, orders)
+    
+    Raises:
+        Exception: If either API request fails
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        positions_future = executor.submit(get_positions, category, settle_coin)
+        orders_future = executor.submit(get_open_orders, category, settle_coin)
+        return positions_future.result(), orders_future.result()
+
+
 def get_conditional_orders(category: str = 'linear', settle_coin: str = 'USDT') -> List[Dict[str, Any]]:
     """
     Fetch all conditional orders (stop loss, take profit triggers).
@@ -265,37 +356,14 @@ def get_conditional_orders(category: str = 'linear', settle_coin: str = 'USDT')
         Exception: If API request fails
     """
     endpoint = '/v5/order/realtime'
-    all_orders = []
-    cursor = None
     
     try:
-        # Loop through all pages
-        while True:
-            params = {
-                'category': category,
-                'settleCoin': settle_coin,
-                'orderFilter': 'StopOrder'  # Filter for conditional orders
-            }
-            
-            # Add cursor for pagination (if not first request)
-            if cursor:
-                params['cursor'] = cursor
-            
-            response = signed_request('GET', endpoint, params)
-            
-            # Extract orders from response
-            result = response.get('result', {})
-            orders = result.get('list', [])
-            
-            # Add orders to our list
-            all_orders.extend(orders)
-            
-            # Check if there are more pages
-            cursor = result.get('nextPageCursor')
-            if not cursor:
-                break
-        
-        return all_orders
+        params = {
+            'category': category,
+            'settleCoin': settle_coin,
+            'orderFilter': 'StopOrder'  # Filter for conditional orders
+        }
+        return list(_paginate(endpoint, params))
     
     except Exception as e:
         raise Exception(f"Failed to fetch conditional orders: {str(e)}")
@@ -350,43 +418,20 @@ def get_todays_trades(category: str = 'linear', settle_coin: str = 'USDT') -> Li
         List of execution dictionaries for today
     """
     endpoint = '/v5/execution/list'
-    all_executions = []
-    cursor = None
-    
-    # Calculate start of day (UTC)
-    now = datetime.now(timezone.utc)
-    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    start_time = int(start_of_day.timestamp() * 1000)
     
     try:
-        while True:
-            params = {
-                'category': category,
-                'limit': 50,  # Fetch 50 at a time
-                'settleCoin': settle_coin,
-                'startTime': start_time
-            }
-            
-            if cursor:
-                params['cursor'] = cursor
-            
-            response = signed_request('GET', endpoint, params)
-            result = response.get('result', {})
-            executions = result.get('list', [])
-            
-            all_executions.extend(executions)
-            
-            cursor = result.get('nextPageCursor')
-            if not cursor:
-                break
-                
-            # Safety limit to prevent excessive API calls
-            if len(all_executions) > 1000:
-                break
+        params = {
+            'category': category,
+            'limit': 100,  # Maximum page size for /v5/execution/list
+            'settleCoin': settle_coin,
+            'startTime': start_of_day_ms()
+        }
+        # Safety limit to prevent excessive API calls
+        executions = _paginate(endpoint, params, max_items=2000)
         
         # Filter out Funding executions and sort by time (newest first)
         trades = [
-            exc for exc in all_executions 
+            exc for exc in executions
             if exc.get('execType') != 'Funding'
         ]
         trades.sort(key=lambda x: int(x.get('execTime', 0)), reverse=True)
@@ -397,10 +442,14 @@ def get_todays_trades(category: str = 'linear', settle_coin: str = 'USDT') -> Li
         raise Exception(f"Failed to fetch today's trades: {str(e)}")
 
 
+@ttl_cache(ACCOUNT_CACHE_TTL)
 def get_closed_pnl(category: str = 'linear', limit: int = 50, start_time: int = None) -> List[Dict[str, Any]]:
     """
     Fetch closed Profit and Loss (Realized PnL).
     
+    Results are cached for ACCOUNT_CACHE_TTL seconds; the records are shared
+    and must not be mutated.
+    
     Args:
         category: Product type ('linear', 'inverse')
         limit: Number of records to fetch
@@ -429,10 +478,29 @@ def get_closed_pnl(category: str = 'linear', limit: int = 50, start_time: int =
         raise Exception(f"Failed to fetch closed PnL: {str(e)}")
 
 
+# Balance returned when Bybit reports no accounts
+_EMPTY_WALLET_BALANCE = {
+    'totalEquity': '0',
+    'totalAvailableBalance': '0',
+    'totalMarginBalance': '0',
+    'totalInitialMargin': '0',
+    'totalMaintenanceMargin': '0',
+    'coin': []
+}
+
+
+def _empty_wallet_balance() -> Dict[str, Any]:
+    """Copy of the empty balance (callers may mutate the result)."""
+    return {**_EMPTY_WALLET_BALANCE, 'coin': []}
+
+
+@ttl_cache(ACCOUNT_CACHE_TTL)
 def get_wallet_balance(account_type: str = 'UNIFIED', coin: str = 'USDT') -> Dict[str, Any]:
     """
     Fetch wallet balance information from Bybit.
     
+    Results are cached for ACCOUNT_CACHE_TTL seconds.
+    
     Args:
         account_type: Account type ('UNIFIED', 'CONTRACT', etc.)
         coin: Coin to get balance for (default: USDT)
@@ -462,25 +530,13 @@ def get_wallet_balance(account_type: str = 'UNIFIED', coin: str = 'USDT') -> Dic
         accounts = result.get('list', [])
         
         if not accounts:
-            return {
-                'totalEquity': '0',
-                'totalAvailableBalance': '0',
-                'totalMarginBalance': '0',
-                'totalInitialMargin': '0',
-                'totalMaintenanceMargin': '0',
-                'coin': []
-            }
+            return _empty_wallet_balance()
         
         # Get the first account (usually there's only one for UNIFIED)
         account = accounts[0]
         
         # Find USDT coin data
-        coins = account.get('coin', [])
-        usdt_data = None
-        for c in coins:
-            if c.get('coin') == coin:
-                usdt_data = c
-                break
+        usdt_data = next((c for c in account.get('coin', []) if c.get('coin') == coin), None)
         
         return {
             'totalEquity': account.get('totalEquity', '0'),
@@ -497,15 +553,50 @@ def get_wallet_balance(account_type: str = 'UNIFIED', coin: str = 'USDT') -> Dic
         raise Exception(f"Failed to fetch wallet balance: {str(e)}")
 
 
+def invalidate_caches() -> None:
+    """
+    Drop cached positions, orders, balance and closed PnL.
+    
+    Call after a fill so the next read reflects the new account state.
+    """
+    for func in (get_positions, get_open_orders, get_closed_pnl, get_wallet_balance):
+        func.cache_clear()
+
+
+def get_account_info() -> Dict[str, Any]:
+    """
+    Fetch account settings (margin mode, account status, etc).
+    
+    A small signed request, which makes it a cheap credentials check.
+    
+    Returns:
+        Account info dictionary
+    
+    Raises:
+        Exception: If API request fails
+    """
+    endpoint = '/v5/account/info'
+    
+    try:
+        response = signed_request('GET', endpoint)
+        return response.get('result', {})
+    
+    except Exception as e:
+        raise Exception(f"Failed to fetch account info: {str(e)}")
+
+
 def test_connection() -> bool:
     """
     Test API connection and credentials.
     
+    Uses the small account info endpoint rather than the full position list;
+    it is signed, so it still verifies the API key and secret.
+    
     Returns:
         True if connection successful, False otherwise
     """
     try:
-        get_positions()
+        get_account_info()
         return True
     except Exception:
         return False
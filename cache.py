@@ -0,0 +1,118 @@
+"""
+Small in-process caching helpers.
+Used to share recent Bybit API results between commands and handlers.
+"""
+
+import copy
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _PendingCall:
+    """Result slot for a call that other threads are waiting on."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def ttl_cache(seconds: float, maxsize: int = 128) -> Callable:
+    """
+    Memoize a function's result per argument tuple for a fixed time.
+    
+    Expired entries are swept whenever a new result is stored, and at most
+    maxsize results are kept (the oldest is dropped first), so callers
+    passing ever-changing arguments cannot grow the cache without bound.
+    
+    The cache is thread-safe. Each hit returns a shallow copy of the cached
+    value, so callers may sort or extend the returned container; the items
+    inside are shared and must be treated as read-only.
+    
+    Arguments are bound to the function's signature (defaults filled in), so
+    f(), f('linear') and f(category='linear') share one entry.
+    
+    Concurrent misses for the same arguments are coalesced: one thread calls
+    the function and the others wait for its result (or its exception)
+    instead of issuing duplicate requests.
+    
+    Args:
+        seconds: How long a result stays valid
+        maxsize: Most results kept at once
+    
+    Returns:
+        Decorator adding the cache (and a cache_clear() method) to a function
+    """
+    def decorator(func: Callable) -> Callable:
+        entries: Dict[Tuple, Tuple[float, Any]] = {}
+        pending: Dict[Tuple, _PendingCall] = {}
+        # Bumped by cache_clear() so calls already in flight don't store
+        # results fetched before the clear
+        generation = [0]
+        lock = threading.Lock()
+        signature = inspect.signature(func)
+        
+        def store(key: Tuple, expires: float, value: Any) -> None:
+            """Insert a result, dropping expired and overflowing entries (lock held)."""
+            now = time.monotonic()
+            for stale in [k for k, (exp, _) in entries.items() if exp <= now]:
+                del entries[stale]
+            # Re-insert so dict order stays oldest-first
+            entries.pop(key, None)
+            entries[key] = (expires, value)
+            while len(entries) > maxsize:
+                del entries[next(iter(entries))]
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.items())
+            now = time.monotonic()
+            
+            with lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] > now:
+                    return copy.copy(entry[1])
+                call = pending.get(key)
+                is_owner = call is None
+                if is_owner:
+                    call = pending[key] = _PendingCall()
+                    started_in = generation[0]
+            
+            if not is_owner:
+                call.done.wait()
+                if call.error is not None:
+                    raise call.error
+                return copy.copy(call.value)
+            
+            try:
+                call.value = func(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+                raise
+            else:
+                with lock:
+                    if generation[0] == started_in:
+                        store(key, now + seconds, call.value)
+                return copy.copy(call.value)
+            finally:
+                with lock:
+                    if pending.get(key) is call:
+                        del pending[key]
+                call.done.set()
+        
+        def cache_clear() -> None:
+            """Drop every cached result and stop sharing calls in flight."""
+            with lock:
+                entries.clear()
+                pending.clear()
+                generation[0] += 1
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    
+    return decorator
@@ -4,11 +4,17 @@ Loads API credentials and settings from environment variables.
 """
 
 import os
+from functools import lru_cache
 from typing import Optional
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file. python-dotenv is optional:
+# deployments that inject variables directly can run without it.
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    pass
+else:
+    load_dotenv()
 
 
 class Config:
@@ -35,14 +41,24 @@ class Config:
     TELEGRAM_BOT_TOKEN: Optional[str] = os.getenv('TELEGRAM_BOT_TOKEN')
     WEB_APP_URL: Optional[str] = os.getenv('WEB_APP_URL')
     
+    # Public HTTPS base URL for Telegram webhooks (optional - polling if unset)
+    WEBHOOK_URL: Optional[str] = os.getenv('WEBHOOK_URL')
+    # Local address the webhook server binds to
+    WEBHOOK_LISTEN: str = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT: int = int(os.getenv('WEBHOOK_PORT', '8443'))
+    
     # Request settings
     RECV_WINDOW: int = 5000  # milliseconds
     
     @classmethod
+    @lru_cache(maxsize=1)
     def validate(cls) -> tuple[bool, str]:
         """
         Validate that required configuration is present.
         
+        The result is memoized since credentials are read once at import;
+        call Config.validate.cache_clear() after changing them at runtime.
+        
         Returns:
             tuple: (is_valid, error_message)
         """
@@ -99,9 +115,3 @@ class Config:
                 return 'openai'
         return None
 
-
-# Validate on import (but don't fail - let the bot handle it)
-_is_valid, _error = Config.validate()
-if not _is_valid:
-    import warnings
-    warnings.warn(f"Configuration warning: {_error}", UserWarning)
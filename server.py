@@ -1,96 +1,150 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 import bybit_api
 import analyzer
 import ai_analysis
 import os
+import warnings
+import time
 from config import Config
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Validate once at startup rather than on every import of config
+    is_valid, error = Config.validate()
+    if not is_valid:
+        warnings.warn(f"Configuration warning: {error}", UserWarning)
+    yield
+    # Release pooled Bybit connections on shutdown
+    bybit_api.close_session()
+
+app = FastAPI(lifespan=lifespan)
+
+# Asset filenames are not fingerprinted, so browsers may reuse them only for a
+# short while; after that the ETag/Last-Modified headers allow cheap 304s
+STATIC_CACHE_CONTROL = "public, max-age=300"
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that adds a Cache-Control header to served assets."""
+    
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", STATIC_CACHE_CONTROL)
+        return response
 
 # Serve static files
-app.mount("/css", StaticFiles(directory="webapp/css"), name="css")
-app.mount("/js", StaticFiles(directory="webapp/js"), name="js")
+app.mount("/css", CachedStaticFiles(directory="webapp/css"), name="css")
+app.mount("/js", CachedStaticFiles(directory="webapp/js"), name="js")
 
 @app.get("/")
 async def read_index():
     return FileResponse("webapp/index.html")
 
+# Seconds a computed API response is shared between pollers (tabs, clients)
+API_CACHE_TTL = 3.0
+
+_response_cache: Dict[str, Tuple[float, Any]] = {}
+_response_locks = {'data': asyncio.Lock(), 'trades': asyncio.Lock()}
+
+async def _cached_response(key: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    """Return a fresh cached response, or build it once for all concurrent callers."""
+    entry = _response_cache.get(key)
+    if entry and time.monotonic() - entry[0] < API_CACHE_TTL:
+        return entry[1]
+    
+    async with _response_locks[key]:
+        # Another request may have refreshed it while we waited
+        entry = _response_cache.get(key)
+        if entry and time.monotonic() - entry[0] < API_CACHE_TTL:
+            return entry[1]
+        
+        data = await build()
+        _response_cache[key] = (time.monotonic(), data)
+        return data
+
 @app.get("/api/data")
 async def get_data():
     try:
-        # Fetch all data in parallel (conceptually, though here sequential is fine for now)
-        balance = bybit_api.get_wallet_balance()
-        positions = bybit_api.get_positions()
-        orders = bybit_api.get_open_orders()
-        
-        # Calculate start of day for daily PnL
-        now = datetime.now(timezone.utc)
-        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_time = int(start_of_day.timestamp() * 1000)
-        
-        closed_pnl_list = bybit_api.get_closed_pnl(start_time=start_time)
-        
-        # Calculate PnL metrics
-        realized_pnl = sum(float(item.get('closedPnl', 0)) for item in closed_pnl_list)
-        unrealized_pnl = sum(float(pos.get('unrealisedPnl', 0)) for pos in positions)
-        total_daily_pnl = realized_pnl + unrealized_pnl
-        
-        pnl_data = {
-            "realized": realized_pnl,
-            "unrealized": unrealized_pnl,
-            "total": total_daily_pnl,
-            "trade_count": len(closed_pnl_list)
-        }
-        
-        # Perform analysis
-        analysis_data = analyzer.analyze_positions(positions, orders)
-        
-        # Get AI suggestions (cached or fresh)
-        # For now, we'll do a quick rule-based analysis to avoid API costs/latency on every poll
-        # Ideally, this should be cached or triggered explicitly
-        ai_suggestions = ai_analysis.analyze_with_ai(analysis_data)
-        
-        return {
-            "balance": balance,
-            "positions": positions,
-            "orders": orders,
-            "pnl": pnl_data,
-            "analysis": ai_suggestions
-        }
+        return await _cached_response('data', _build_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _build_data() -> Dict[str, Any]:
+    # Start of day for daily PnL
+    start_time = bybit_api.start_of_day_ms()
+    
+    # Fetch all data in parallel; the blocking client runs in worker
+    # threads so the event loop stays free
+    balance, positions, orders, closed_pnl_list = await asyncio.gather(
+        asyncio.to_thread(bybit_api.get_wallet_balance),
+        asyncio.to_thread(bybit_api.get_positions),
+        asyncio.to_thread(bybit_api.get_open_orders),
+        asyncio.to_thread(bybit_api.get_closed_pnl, start_time=start_time)
+    )
+    
+    # Perform analysis (its single pass over positions also totals unrealized PnL)
+    analysis_data = analyzer.analyze_positions(positions, orders)
+    
+    # Calculate PnL metrics
+    realized_pnl = sum(map(float, (item.get('closedPnl') or '0' for item in closed_pnl_list)))
+    unrealized_pnl = analysis_data['portfolio']['total_unrealized_pnl']
+    total_daily_pnl = realized_pnl + unrealized_pnl
+    
+    pnl_data = {
+        "realized": realized_pnl,
+        "unrealized": unrealized_pnl,
+        "total": total_daily_pnl,
+        "trade_count": len(closed_pnl_list)
+    }
+    
+    # Get AI suggestions (cached or fresh)
+    # For now, we'll do a quick rule-based analysis to avoid API costs/latency on every poll
+    # Ideally, this should be cached or triggered explicitly
+    ai_suggestions = await asyncio.to_thread(ai_analysis.analyze_with_ai, analysis_data)
+    
+    return {
+        "balance": balance,
+        "positions": positions,
+        "orders": orders,
+        "pnl": pnl_data,
+        "analysis": ai_suggestions
+    }
+
 @app.get("/api/trades")
 async def get_trades():
     try:
-        # Fetch closed PnL records
-        # The user wants to see PnL, so we prioritize the closed PnL endpoint which guarantees this data
-        closed_pnl_list = bybit_api.get_closed_pnl(limit=50)
-        
-        trades = []
-        for item in closed_pnl_list:
-            # Map closed PnL fields to the structure expected by the frontend
-            trades.append({
-                "symbol": item.get("symbol"),
-                "side": item.get("side"),
-                "execTime": item.get("updatedTime"), 
-                "execPrice": float(item.get("avgExitPrice", 0)),
-                "execQty": float(item.get("qty", 0)),
-                "execFee": float(item.get("execFee", 0)),  # Try to get fee if available
-                "closedPnl": float(item.get("closedPnl", 0)) if item.get("closedPnl") is not None else None,
-                "orderId": item.get("orderId")
-            })
-            
-        return trades
+        return await _cached_response('trades', _build_trades)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _build_trades() -> List[Dict[str, Any]]:
+    # Fetch closed PnL records
+    # The user wants to see PnL, so we prioritize the closed PnL endpoint which guarantees this data
+    closed_pnl_list = await asyncio.to_thread(bybit_api.get_closed_pnl, limit=50)
+    
+    trades = []
+    for item in closed_pnl_list:
+        # Map closed PnL fields to the structure expected by the frontend
+        trades.append({
+            "symbol": item.get("symbol"),
+            "side": item.get("side"),
+            "execTime": item.get("updatedTime"), 
+            "execPrice": float(item.get("avgExitPrice", 0)),
+            "execQty": float(item.get("qty", 0)),
+            "execFee": float(item.get("execFee", 0)),  # Try to get fee if available
+            "closedPnl": float(item.get("closedPnl", 0)) if item.get("closedPnl") is not None else None,
+            "orderId": item.get("orderId")
+        })
+        
+    return trades
+
 if __name__ == "__main__":
-    # Run server
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Run server. Keep a single worker: the response cache lives in-process.
+    # uvicorn[standard] picks uvloop and httptools automatically when installed.
+    uvicorn.run(app, host="0.0.0.0", port=8000, workers=1)
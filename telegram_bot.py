@@ -5,12 +5,20 @@ Provides a Telegram interface to interact with the Bybit analysis bot.
 """
 
 import asyncio
+import datetime
+import heapq
 import logging
 import html
 import json
-from typing import Optional
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import os
+from collections import namedtuple
+from itertools import islice
+from typing import List, Optional, Set, Tuple
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     CallbackQueryHandler,
@@ -30,23 +38,155 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Blocking Bybit calls allowed in worker threads at once, so a burst of button
+# presses cannot spawn an unbounded number of threads
+_MAX_BLOCKING_CALLS = 8
+_blocking_call_slots = asyncio.Semaphore(_MAX_BLOCKING_CALLS)
+
+# Chat that receives WebSocket order notifications, remembered across restarts
+CHAT_ID_FILE = os.path.join(os.path.dirname(__file__), 'chat_id.txt')
+
+# One parsed position in the /list report
+_PositionRow = namedtuple(
+    '_PositionRow',
+    'symbol side size entry_price mark_price leverage unrealized_pnl value funding_rate funding_info'
+)
+
+# Longest text sent in one message, kept a little under Telegram's 4096 cap
+MESSAGE_CHUNK_LIMIT = 4000
+
+# Rules drawn under report titles
+SEPARATOR = "=" * 50
+SHORT_SEPARATOR = "=" * 30
+
+# Status markers: green/red for gains and buys vs losses and sells,
+# arrows for long vs short positions and orders
+GREEN = "🟢"
+RED = "🔴"
+LONG_EMOJI = "📈"
+SHORT_EMOJI = "📉"
+# Order/position side -> arrow; anything but "Buy" is shown as short
+SIDE_EMOJI = {"Buy": LONG_EMOJI, "Sell": SHORT_EMOJI}
+
+
+async def _offload(func, *args, **kwargs):
+    """
+    Run a blocking call in a worker thread without stalling the event loop.
+    
+    Args:
+        func: Synchronous callable (usually a bybit_api function)
+        *args, **kwargs: Arguments passed to func
+    
+    Returns:
+        Whatever func returns
+    """
+    async with _blocking_call_slots:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def _discard(task: asyncio.Future) -> None:
+    """
+    Drop a task whose result is no longer needed.
+    
+    Cancels it if still running; if it already failed, its exception is
+    marked as retrieved so asyncio does not log it as unhandled.
+    
+    Args:
+        task: Task or future to discard
+    """
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _edit_text(message: Message, text: str, **kwargs) -> None:
+    """
+    Edit a message, tolerating a refresh that produced identical content.
+    
+    Args:
+        message: Message to edit
+        text: New text
+        **kwargs: Passed to Message.edit_text
+    """
+    try:
+        await message.edit_text(text, **kwargs)
+    except BadRequest as e:
+        if 'not modified' not in str(e).lower():
+            raise
+
+
+def _chunk_html(text: str, limit: int = MESSAGE_CHUNK_LIMIT, separators: Tuple[str, ...] = ("\n\n", "\n")) -> List[str]:
+    """
+    Split an HTML message into chunks Telegram will accept.
+    
+    Cuts fall on blank lines (then single line breaks) so tags are never
+    split; only a single line longer than the limit is hard-sliced.
+    
+    Args:
+        text: Message text
+        limit: Maximum chunk length
+        separators: Boundaries to cut at, most preferred first
+    
+    Returns:
+        List of chunks, each at most limit characters
+    """
+    if len(text) <= limit:
+        return [text]
+    if not separators:
+        return [text[i:i + limit] for i in range(0, len(text), limit)]
+    
+    sep, finer = separators[0], separators[1:]
+    chunks = []
+    current = ""
+    for piece in text.split(sep):
+        candidate = f"{current}{sep}{piece}" if current else piece
+        if len(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        if len(piece) <= limit:
+            current = piece
+        else:
+            *full, current = _chunk_html(piece, limit, finer)
+            chunks.extend(full)
+    if current:
+        chunks.append(current)
+    return chunks
+
 
 class TelegramBot:
     """Telegram bot for Bybit position analysis."""
     
+    # Views that get a navigation keyboard (None = no current view)
+    NAV_VIEWS = (None, 'balance', 'pnl', 'list', 'orders', 'trades', 'analyze')
+    
     def __init__(self, token: str):
         """Initialize the bot with a Telegram token."""
         self.token = token
         self.chat_id = self._load_chat_id()
         self.ws_client = None
+        # Keyboards never change, so build each variant once
+        self._nav_keyboards = {view: self._build_navigation_keyboard(view) for view in self.NAV_VIEWS}
+        # Built on first /help; configuration does not change at runtime
+        self._help_text: Optional[str] = None
+        # Button callback_data -> handler
+        self._callback_handlers = {
+            'balance': self.show_balance,
+            'pnl': self.show_daily_pnl,
+            'list': self.list_positions,
+            'orders': self.list_orders,
+            'trades': self.show_recent_trades,
+            'analyze': self.analyze_positions,
+            'help': self.help_command,
+        }
+        # (chat_id, callback_data) of button presses still being handled
+        self._inflight: Set[Tuple[int, str]] = set()
 
     def _load_chat_id(self) -> Optional[int]:
         """Load chat_id from file."""
         try:
-            import os
-            path = os.path.join(os.path.dirname(__file__), 'chat_id.txt')
-            if os.path.exists(path):
-                with open(path, 'r') as f:
+            if os.path.exists(CHAT_ID_FILE):
+                with open(CHAT_ID_FILE, 'r') as f:
                     cid = int(f.read().strip())
                     logger.info(f"Loaded chat_id from file: {cid}")
                     return cid
@@ -58,9 +198,7 @@ class TelegramBot:
     def _save_chat_id(self, chat_id: int) -> None:
         """Save chat_id to file."""
         try:
-            import os
-            path = os.path.join(os.path.dirname(__file__), 'chat_id.txt')
-            with open(path, 'w') as f:
+            with open(CHAT_ID_FILE, 'w') as f:
                 f.write(str(chat_id))
             self.chat_id = chat_id
             logger.info(f"Saved chat_id: {chat_id}")
@@ -118,13 +256,15 @@ class TelegramBot:
                 elif order_status == 'New':
                     emoji = "🆕"
                 
-                msg = f"{emoji} <b>Order Update: {order_status}</b>\n"
-                msg += f"<b>{symbol}</b> ({side})\n"
-                msg += f"Type: {order_type}\n"
-                msg += f"Qty: {qty} | Price: ${price}\n"
+                parts = [
+                    f"{emoji} <b>Order Update: {order_status}</b>\n",
+                    f"<b>{symbol}</b> ({side})\n",
+                    f"Type: {order_type}\n",
+                    f"Qty: {qty} | Price: ${price}\n",
+                ]
                 
                 if float(avg_price) > 0:
-                    msg += f"Avg Price: ${avg_price}\n"
+                    parts.append(f"Avg Price: ${avg_price}\n")
                 
                 # If order is filled, try to get PnL
                 if order_status == 'Filled':
@@ -132,13 +272,11 @@ class TelegramBot:
                         # Wait a brief moment for PnL to settle in Bybit backend
                         await asyncio.sleep(1)
                         
-                        # Run synchronous API call in executor
-                        loop = asyncio.get_running_loop()
+                        # The fill changed the account; don't serve cached reads
+                        bybit_api.invalidate_caches()
+                        
                         # Fetch recent closed PnL
-                        closed_pnl_list = await loop.run_in_executor(
-                            None, 
-                            lambda: bybit_api.get_closed_pnl(limit=10)
-                        )
+                        closed_pnl_list = await _offload(bybit_api.get_closed_pnl, limit=10)
                         
                         # Find matching PnL for this order
                         matched_pnl = None
@@ -149,18 +287,34 @@ class TelegramBot:
                         
                         if matched_pnl:
                             closed_pnl = float(matched_pnl.get('closedPnl', 0))
-                            pnl_emoji = "🟢" if closed_pnl >= 0 else "🔴"
-                            msg += f"\n{pnl_emoji} <b>Realized PnL: ${closed_pnl:.2f}</b>"
+                            pnl_emoji = GREEN if closed_pnl >= 0 else RED
+                            parts.append(f"\n{pnl_emoji} <b>Realized PnL: ${closed_pnl:.2f}</b>")
                             
                     except Exception as e:
                         logger.error(f"Error fetching PnL for filled order: {e}")
 
-                await self.application.bot.send_message(chat_id=self.chat_id, text=msg, parse_mode='HTML')
+                await self.application.bot.send_message(chat_id=self.chat_id, text="".join(parts), parse_mode=ParseMode.HTML)
 
         except Exception as e:
             logger.error(f"Error processing WebSocket order update: {e}")
 
     def get_navigation_keyboard(self, exclude: str = None) -> InlineKeyboardMarkup:
+        """
+        Get the navigation keyboard with quick action buttons.
+        
+        Args:
+            exclude: Command to exclude from the keyboard (e.g., 'balance', 'list')
+        
+        Returns:
+            Prebuilt InlineKeyboardMarkup with navigation buttons
+        """
+        keyboard = self._nav_keyboards.get(exclude)
+        if keyboard is None:
+            keyboard = self._build_navigation_keyboard(exclude)
+        return keyboard
+    
+    @staticmethod
+    def _build_navigation_keyboard(exclude: str = None) -> InlineKeyboardMarkup:
         """
         Create navigation keyboard with quick action buttons.
         
@@ -205,6 +359,63 @@ class TelegramBot:
         
         return InlineKeyboardMarkup(buttons)
         
+    async def _ack(self, update: Update, text: str) -> Message:
+        """
+        Acknowledge a command or button press while its report is prepared.
+        
+        Button presses get a toast and reuse the pressed message, saving the
+        extra "fetching..." edit; commands get a progress reply.
+        
+        Args:
+            update: Update being answered
+            text: Progress text shown to the user
+        
+        Returns:
+            Message to replace with the finished report
+        """
+        query = update.callback_query
+        if query:
+            if query.message is not None and query.message.is_accessible:
+                await query.answer(text)
+                return query.message
+            # Clear the button spinner while the progress message goes out
+            _, message = await asyncio.gather(
+                query.answer(text),
+                update.effective_chat.send_message(text)
+            )
+            return message
+        return await update.message.reply_text(text)
+    
+    async def _send_chunked(self, update: Update, message, text: str, keyboard: InlineKeyboardMarkup) -> None:
+        """
+        Deliver a long HTML report in as many messages as needed.
+        
+        The first chunk replaces the progress message, the rest are sent as
+        new messages, and the keyboard is attached to the last one.
+        
+        The edit keeps its place in the chat, so it runs alongside the new
+        messages; those are still sent one by one because Telegram orders
+        them by arrival.
+        
+        Args:
+            update: Update being answered
+            message: Progress message to edit with the first chunk
+            text: Full HTML report
+            keyboard: Navigation keyboard for the final chunk
+        """
+        first, *rest = _chunk_html(text)
+        
+        async def send_rest() -> None:
+            for i, chunk in enumerate(rest, start=1):
+                reply_markup = keyboard if i == len(rest) else None
+                await update.effective_chat.send_message(chunk, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+        
+        edit = _edit_text(message, first, parse_mode=ParseMode.HTML, reply_markup=None if rest else keyboard)
+        if rest:
+            await asyncio.gather(edit, send_rest())
+        else:
+            await edit
+    
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Send a message when the command /start is issued."""
         user = update.effective_user
@@ -255,7 +466,20 @@ class TelegramBot:
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Send a message when the command /help is issued."""
-        help_text = (
+        if self._help_text is None:
+            self._help_text = self._build_help_text()
+        help_text = self._help_text
+        
+        if update.callback_query:
+            await update.callback_query.answer()
+            await update.callback_query.edit_message_text(help_text, parse_mode=ParseMode.HTML)
+        else:
+            await update.message.reply_html(help_text)
+    
+    @staticmethod
+    def _build_help_text() -> str:
+        """Create the /help message."""
+        return (
             "🤖 <b>Bybit Position Analysis Bot</b>\n\n"
             "<b>Available Commands:</b>\n\n"
             "/start - Start the bot and show menu\n"
@@ -278,24 +502,14 @@ class TelegramBot:
             f"• API URL: {Config.BYBIT_BASE_URL}\n"
             f"• AI Provider: {Config.get_ai_provider() or 'None'}\n"
         )
-        
-        if update.callback_query:
-            await update.callback_query.answer()
-            await update.callback_query.edit_message_text(help_text, parse_mode='HTML')
-        else:
-            await update.message.reply_html(help_text)
     
     async def show_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Show account balance and margin information."""
-        if update.callback_query:
-            await update.callback_query.answer()
-            message = await update.callback_query.edit_message_text("💰 Fetching balance from Bybit...")
-        else:
-            message = await update.message.reply_text("💰 Fetching balance from Bybit...")
+        message = await self._ack(update, "💰 Fetching balance from Bybit...")
         
         try:
             # Fetch wallet balance
-            balance = bybit_api.get_wallet_balance()
+            balance = await _offload(bybit_api.get_wallet_balance)
             
             # Parse balance values
             total_equity = float(balance.get('totalEquity', 0))
@@ -310,71 +524,86 @@ class TelegramBot:
                 margin_usage = (initial_margin / margin_balance) * 100
             
             # Format response
-            response = f"💰 <b>Account Balance</b>\n"
-            response += f"{'='*50}\n\n"
+            parts = [
+                f"💰 <b>Account Balance</b>\n",
+                f"{SEPARATOR}\n\n"
+            ]
             
-            response += f"<b>💵 Balance Overview</b>\n"
-            response += f"Total Equity: <b>${total_equity:,.2f}</b> USDT\n"
-            response += f"Available Balance: <b>${available_balance:,.2f}</b> USDT\n"
-            response += f"Margin Balance: ${margin_balance:,.2f} USDT\n\n"
+            parts.append(f"<b>💵 Balance Overview</b>\n")
+            parts.append(f"Total Equity: <b>${total_equity:,.2f}</b> USDT\n")
+            parts.append(f"Available Balance: <b>${available_balance:,.2f}</b> USDT\n")
+            parts.append(f"Margin Balance: ${margin_balance:,.2f} USDT\n\n")
             
-            response += f"<b>📊 Margin Information</b>\n"
-            response += f"Initial Margin: ${initial_margin:,.2f} USDT\n"
-            response += f"Maintenance Margin: ${maintenance_margin:,.2f} USDT\n"
-            response += f"Margin Usage: <b>{margin_usage:.2f}%</b>\n\n"
+            parts.append(f"<b>📊 Margin Information</b>\n")
+            parts.append(f"Initial Margin: ${initial_margin:,.2f} USDT\n")
+            parts.append(f"Maintenance Margin: ${maintenance_margin:,.2f} USDT\n")
+            parts.append(f"Margin Usage: <b>{margin_usage:.2f}%</b>\n\n")
             
             # Add margin usage warning
             if margin_usage > 80:
-                response += "🔴 <b>WARNING:</b> High margin usage! Consider reducing positions.\n"
+                parts.append("🔴 <b>WARNING:</b> High margin usage! Consider reducing positions.\n")
             elif margin_usage > 60:
-                response += "🟡 <b>CAUTION:</b> Moderate margin usage. Monitor closely.\n"
+                parts.append("🟡 <b>CAUTION:</b> Moderate margin usage. Monitor closely.\n")
             else:
-                response += "🟢 <b>HEALTHY:</b> Margin usage is within safe limits.\n"
+                parts.append("🟢 <b>HEALTHY:</b> Margin usage is within safe limits.\n")
+            
+            response = "".join(parts)
             
             # Add navigation buttons
             keyboard = self.get_navigation_keyboard(exclude='balance')
-            await message.edit_text(response, parse_mode='HTML', reply_markup=keyboard)
+            await _edit_text(message, response, parse_mode=ParseMode.HTML, reply_markup=keyboard)
             
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
             keyboard = self.get_navigation_keyboard()
-            await message.edit_text(error_msg, reply_markup=keyboard)
+            await _edit_text(message, error_msg, reply_markup=keyboard)
             logger.error(f"Error fetching balance: {e}")
     
     async def list_positions(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """List all open positions."""
-        # Send "processing" message
-        if update.callback_query:
-            await update.callback_query.answer()
-            message = await update.callback_query.edit_message_text("📡 Fetching positions from Bybit...")
-        else:
-            message = await update.message.reply_text("📡 Fetching positions from Bybit...")
+        message = await self._ack(update, "📡 Fetching positions from Bybit...")
         
         try:
-            # Fetch positions
-            positions = bybit_api.get_positions()
+            # Fetch positions and balance concurrently; only the positions
+            # are required
+            balance_task = asyncio.ensure_future(_offload(bybit_api.get_wallet_balance))
+            try:
+                positions = await _offload(bybit_api.get_positions)
+            except Exception:
+                _discard(balance_task)
+                raise
             
             if not positions:
-                await message.edit_text("ℹ️ No open positions found.")
+                _discard(balance_task)
+                await _edit_text(message, "ℹ️ No open positions found.")
                 return
             
-            # Fetch Tickers for Funding Rates
-            try:
-                tickers = bybit_api.get_tickers(category='linear')
-                tickers_map = {t['symbol']: t for t in tickers}
-            except Exception as e:
-                logger.warning(f"Failed to fetch tickers: {e}")
+            # Every linear ticker is a large payload, so funding rates are
+            # only fetched once there are positions to show them for
+            tickers, balance = await asyncio.gather(
+                _offload(bybit_api.get_tickers, category='linear'),
+                balance_task,
+                return_exceptions=True
+            )
+            
+            if isinstance(tickers, Exception):
+                logger.warning(f"Failed to fetch tickers: {tickers}")
                 tickers_map = {}
+            else:
+                tickers_map = {t['symbol']: t for t in tickers}
             
-            header = f"📋 <b>Bybit Positions List</b>\n"
-            header += f"{'='*50}\n\n"
-            header += f"✅ Found {len(positions)} open position(s)\n\n"
+            header = (
+                f"📋 <b>Bybit Positions List</b>\n"
+                f"{SEPARATOR}\n\n"
+                f"✅ Found {len(positions)} open position(s)\n\n"
+            )
             
-            total_value = 0
-            total_pnl = 0
+            parts = [header]
             
-            current_message = header
-            is_first_message = True
+            # Parse every position once; the position dicts are shared with
+            # the API cache, so derived values live in the rows instead
+            rows = []
+            now_utc = datetime.datetime.now(datetime.timezone.utc)
             
             for pos in positions:
                 symbol = html.escape(str(pos.get('symbol', 'N/A')))
@@ -386,23 +615,16 @@ class TelegramBot:
                 unrealized_pnl = float(pos.get('unrealisedPnl', 0))
                 
                 position_value = abs(size * mark_price)
-                total_value += position_value
-                total_pnl += unrealized_pnl
                 
                 # Default funding info
-                pos['fundingRate'] = 0.0
-                pos['estFundingFee'] = 0.0
-                pos['fundingInfoStr'] = ""
+                funding_rate = 0.0
+                funding_info_str = ""
                 
                 if symbol in tickers_map:
                     ticker = tickers_map[symbol]
                     funding_rate = float(ticker.get('fundingRate', 0))
                     est_fee = position_value * funding_rate
                     
-                    # Store for sorting and display
-                    pos['fundingRate'] = funding_rate
-                    pos['estFundingFee'] = est_fee
-                    
                     # Determine Pay/Receive
                     is_long = (side == 'Buy')
                     is_pay = (is_long and funding_rate > 0) or (not is_long and funding_rate < 0)
@@ -415,13 +637,11 @@ class TelegramBot:
                     funding_time_str = "N/A"
                     funding_countdown_str = ""
                     if next_funding_time_ms > 0:
-                        import datetime
                         # Convert milliseconds to seconds, then to datetime object in UTC
                         dt_object = datetime.datetime.fromtimestamp(next_funding_time_ms / 1000, tz=datetime.timezone.utc)
                         funding_time_str = dt_object.strftime('%H:%M UTC') # Format as HH:MM UTC
                         
                         # Calculate countdown
-                        now_utc = datetime.datetime.now(datetime.timezone.utc)
                         time_until_funding = dt_object - now_utc
                         
                         if time_until_funding.total_seconds() > 0:
@@ -429,103 +649,76 @@ class TelegramBot:
                             minutes, seconds = divmod(remainder, 60)
                             funding_countdown_str = f" ({hours:02d}h {minutes:02d}m)"
                         
-                    pos['fundingInfoStr'] = f"  Funding: {rate_pct:.4f}% | {action_str} ${abs(est_fee):.4f}{funding_countdown_str}\n"
+                    funding_info_str = f"  Funding: {rate_pct:.4f}% | {action_str} ${abs(est_fee):.4f}{funding_countdown_str}\n"
                 
+                rows.append(_PositionRow(
+                    symbol, side, size, entry_price, mark_price, leverage,
+                    unrealized_pnl, position_value, funding_rate, funding_info_str
+                ))
+            
+            total_value = sum(row.value for row in rows)
+            total_pnl = sum(row.unrealized_pnl for row in rows)
+            
             # Sort positions by absolute funding rate (lowest rate first)
-            positions.sort(key=lambda p: abs(p.get('fundingRate', 0.0)), reverse=False)
+            rows.sort(key=lambda row: abs(row.funding_rate))
             
-            for pos in positions:
-                symbol = html.escape(str(pos.get('symbol', 'N/A')))
-                side = html.escape(str(pos.get('side', 'N/A')))
-                size = float(pos.get('size', 0))
-                entry_price = float(pos.get('avgPrice', 0))
-                mark_price = float(pos.get('markPrice', 0))
-                leverage = float(pos.get('leverage', 0))
-                unrealized_pnl = float(pos.get('unrealisedPnl', 0))
-                
-                pnl_emoji = "🟢" if unrealized_pnl >= 0 else "🔴"
-                side_emoji = "📈" if side == "Buy" else "📉"
+            for symbol, side, size, entry_price, mark_price, leverage, unrealized_pnl, _, _, funding_info_str in rows:
+                pnl_emoji = GREEN if unrealized_pnl >= 0 else RED
+                side_emoji = SIDE_EMOJI.get(side, SHORT_EMOJI)
                 
-                pos_str = f"{side_emoji} <b>{symbol}</b> ({side})\n"
-                pos_str += f"  Size: {size:.4f} | Entry: ${entry_price:.4f}\n"
-                pos_str += f"  Mark: ${mark_price:.4f} | Lev: {leverage}x\n"
-                pos_str += f"  {pnl_emoji} PnL: ${unrealized_pnl:.2f}\n"
-                pos_str += pos['fundingInfoStr']
-                pos_str += "\n"
-                
-                if len(current_message) + len(pos_str) > 4000:
-                    if is_first_message:
-                        await message.edit_text(current_message, parse_mode='HTML')
-                        is_first_message = False
-                    else:
-                        await update.effective_chat.send_message(current_message, parse_mode='HTML')
-                    current_message = pos_str
-                else:
-                    current_message += pos_str
-            
-            
-            footer = f"{'='*50}\n"
-            footer += f"💰 Total Value: ${total_value:.2f} USDT\n"
-            footer += f"💰 Total PnL: ${total_pnl:.2f} USDT\n\n"
-            
-            # Add balance info
-            try:
-                balance = bybit_api.get_wallet_balance()
+                pos_str = (
+                    f"{side_emoji} <b>{symbol}</b> ({side})\n"
+                    f"  Size: {size:.4f} | Entry: ${entry_price:.4f}\n"
+                    f"  Mark: ${mark_price:.4f} | Lev: {leverage}x\n"
+                    f"  {pnl_emoji} PnL: ${unrealized_pnl:.2f}\n"
+                    f"{funding_info_str}\n"
+                )
+                parts.append(pos_str)
+            
+            parts.extend([
+                f"{SEPARATOR}\n",
+                f"💰 Total Value: ${total_value:.2f} USDT\n",
+                f"💰 Total PnL: ${total_pnl:.2f} USDT\n\n"
+            ])
+            
+            # Add balance info (skipped if the balance fetch failed)
+            if not isinstance(balance, Exception):
                 available = float(balance.get('totalAvailableBalance', 0))
                 equity = float(balance.get('totalEquity', 0))
-                footer += f"<b>Account Balance:</b>\n"
-                footer += f"Available: ${available:,.2f} USDT\n"
-                footer += f"Total Equity: ${equity:,.2f} USDT\n"
-            except:
-                pass  # Silently fail if balance fetch fails
-            
-            if len(current_message) + len(footer) > 4000:
-                if is_first_message:
-                    await message.edit_text(current_message, parse_mode='HTML')
-                    is_first_message = False
-                else:
-                    await update.effective_chat.send_message(current_message, parse_mode='HTML')
-                current_message = footer
-            else:
-                current_message += footer
-            
+                parts.append(
+                    f"<b>Account Balance:</b>\n"
+                    f"Available: ${available:,.2f} USDT\n"
+                    f"Total Equity: ${equity:,.2f} USDT\n"
+                )
             
             # Add navigation buttons
             keyboard = self.get_navigation_keyboard(exclude='list')
-            
-            if is_first_message:
-                await message.edit_text(current_message, parse_mode='HTML', reply_markup=keyboard)
-            else:
-                await update.effective_chat.send_message(current_message, parse_mode='HTML', reply_markup=keyboard)
+            await self._send_chunked(update, message, "".join(parts), keyboard)
                 
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
             keyboard = self.get_navigation_keyboard()
-            await message.edit_text(error_msg, reply_markup=keyboard)
+            await _edit_text(message, error_msg, reply_markup=keyboard)
             logger.error(f"Error fetching positions: {e}")
     
     async def list_orders(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """List all open orders."""
-        if update.callback_query:
-            await update.callback_query.answer()
-            message = await update.callback_query.edit_message_text("📡 Fetching orders from Bybit...")
-        else:
-            message = await update.message.reply_text("📡 Fetching orders from Bybit...")
+        message = await self._ack(update, "📡 Fetching orders from Bybit...")
         
         try:
-            orders = bybit_api.get_open_orders()
+            orders = await _offload(bybit_api.get_open_orders)
             
             if not orders:
-                await message.edit_text("ℹ️ No open orders found.")
+                await _edit_text(message, "ℹ️ No open orders found.")
                 return
             
-            header = f"📋 <b>Bybit Open Orders</b>\n"
-            header += f"{'='*50}\n\n"
-            header += f"✅ Found {len(orders)} open order(s)\n\n"
-            
+            header = (
+                f"📋 <b>Bybit Open Orders</b>\n"
+                f"{SEPARATOR}\n\n"
+                f"✅ Found {len(orders)} open order(s)\n\n"
+            )
             
-            current_message = header
-            is_first_message = True
+            parts = [header]
             
             for order in orders:
                 symbol = html.escape(str(order.get('symbol', 'N/A')))
@@ -535,182 +728,153 @@ class TelegramBot:
                 qty = float(order.get('qty', 0))
                 order_id = html.escape(str(order.get('orderId', 'N/A')))
                 
-                side_emoji = "📈" if side == "Buy" else "📉"
-                
-                order_str = f"{side_emoji} <b>{symbol}</b> ({side})\n"
-                order_str += f"  Type: {order_type}\n"
-                order_str += f"  Price: ${price:.4f} | Qty: {qty:.4f}\n"
-                order_str += f"  Order ID: {order_id}\n\n"
+                side_emoji = SIDE_EMOJI.get(side, SHORT_EMOJI)
                 
-                if len(current_message) + len(order_str) > 4000:
-                    if is_first_message:
-                        await message.edit_text(current_message, parse_mode='HTML')
-                        is_first_message = False
-                    else:
-                        await update.effective_chat.send_message(current_message, parse_mode='HTML')
-                    current_message = order_str
-                else:
-                    current_message += order_str
+                order_str = (
+                    f"{side_emoji} <b>{symbol}</b> ({side})\n"
+                    f"  Type: {order_type}\n"
+                    f"  Price: ${price:.4f} | Qty: {qty:.4f}\n"
+                    f"  Order ID: {order_id}\n\n"
+                )
+                parts.append(order_str)
             
             keyboard = self.get_navigation_keyboard(exclude='orders')
-            if is_first_message:
-                await message.edit_text(current_message, parse_mode='HTML', reply_markup=keyboard)
-            else:
-                await update.effective_chat.send_message(current_message, parse_mode='HTML', reply_markup=keyboard)
+            await self._send_chunked(update, message, "".join(parts), keyboard)
                 
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
             keyboard = self.get_navigation_keyboard()
             try:
-                await message.edit_text(error_msg, reply_markup=keyboard)
+                await _edit_text(message, error_msg, reply_markup=keyboard)
             except:
                 await update.effective_chat.send_message(error_msg, reply_markup=keyboard)
             logger.error(f"Error fetching orders: {e}")
     
     async def analyze_positions(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Analyze positions with AI."""
-        if update.callback_query:
-            await update.callback_query.answer()
-            message = await update.callback_query.edit_message_text("🔍 Analyzing positions...")
-        else:
-            message = await update.message.reply_text("🔍 Analyzing positions...")
+        message = await self._ack(update, "🔍 Analyzing positions...")
         
         try:
-            # Fetch positions and orders
-            positions = bybit_api.get_positions()
-            orders = bybit_api.get_open_orders()
+            # Fetch positions and orders concurrently
+            positions, orders = await asyncio.gather(
+                _offload(bybit_api.get_positions),
+                _offload(bybit_api.get_open_orders)
+            )
             
             if not positions and not orders:
-                await message.edit_text("ℹ️ No open positions or orders to analyze.")
+                await _edit_text(message, "ℹ️ No open positions or orders to analyze.")
                 return
             
-            # Analyze positions and orders
-            analysis = analyzer.analyze_positions(positions, orders)
-            
-            # Generate AI suggestions
-            suggestions = ai_analysis.analyze_with_ai(analysis)
+            # Analyze positions and orders, then generate AI suggestions; both
+            # run in worker threads (the AI request can take seconds) and stay
+            # outside the Bybit call limit
+            analysis = await asyncio.to_thread(analyzer.analyze_positions, positions, orders)
+            suggestions = await asyncio.to_thread(ai_analysis.analyze_with_ai, analysis)
             
             # Format response
-            response = f"🔍 <b>Position Analysis</b>\n"
-            response += f"{'='*50}\n"
-            response += f"<i>Risk Tolerance: 4% per day</i>\n\n"
+            parts = [
+                f"🔍 <b>Position Analysis</b>\n",
+                f"{SEPARATOR}\n",
+                f"<i>Risk Tolerance: 4% per day</i>\n\n"
+            ]
             
             # Portfolio summary
             portfolio = analysis['portfolio']
-            response += f"<b>📊 Portfolio Summary</b>\n"
-            response += f"Long Exposure: ${portfolio['total_long_exposure']:.2f}\n"
-            response += f"Short Exposure: ${portfolio['total_short_exposure']:.2f}\n"
-            response += f"Net Exposure: ${portfolio['net_exposure']:.2f}\n"
-            response += f"Total PnL: ${portfolio['total_unrealized_pnl']:.2f}\n"
-            response += f"Bias: {portfolio['bias'].upper()}\n"
-            response += f"Positions: {portfolio['total_positions']}\n\n"
-            
-            # High risk positions
-            analyzed_positions = analysis['positions']
-            high_risk = [p for p in analyzed_positions if p['leverage_risk'] == 'high']
+            parts.append(f"<b>📊 Portfolio Summary</b>\n")
+            parts.append(f"Long Exposure: ${portfolio['total_long_exposure']:.2f}\n")
+            parts.append(f"Short Exposure: ${portfolio['total_short_exposure']:.2f}\n")
+            parts.append(f"Net Exposure: ${portfolio['net_exposure']:.2f}\n")
+            parts.append(f"Total PnL: ${portfolio['total_unrealized_pnl']:.2f}\n")
+            parts.append(f"Bias: {portfolio['bias'].upper()}\n")
+            parts.append(f"Positions: {portfolio['total_positions']}\n\n")
             
-            # Risk Metrics
             risks = analysis['risks']
-            response += f"<b>⚠️ Risk Metrics</b>\n"
-            response += f"High Leverage: {risks['high_leverage_count']}\n"
-            response += f"Close to Liq: {risks['close_liquidation_count']}\n"
-            response += f"No Stop Loss: {risks.get('no_stop_loss_count', 0)}\n"
+            
+            # High risk positions: the analyzer already counted them, so only
+            # the few that get listed are collected
+            high_risk_count = risks['high_leverage_count']
+            high_risk = list(islice(
+                (p for p in analysis['positions'] if p['leverage_risk_code'] == analyzer.LEVERAGE_RISK_HIGH),
+                5
+            ))
+            
+            # Risk Metrics
+            parts.append(f"<b>⚠️ Risk Metrics</b>\n")
+            parts.append(f"High Leverage: {high_risk_count}\n")
+            parts.append(f"Close to Liq: {risks['close_liquidation_count']}\n")
+            parts.append(f"No Stop Loss: {risks.get('no_stop_loss_count', 0)}\n")
             
             risky_pos_count = len(risks.get('risky_positions', []))
             if risky_pos_count > 0:
-                response += f"🔴 <b>Unhedged & No SL: {risky_pos_count}</b>\n"
+                parts.append(f"🔴 <b>Unhedged & No SL: {risky_pos_count}</b>\n")
             else:
-                response += f"Unhedged & No SL: 0\n"
+                parts.append(f"Unhedged & No SL: 0\n")
                 
             hedged_count = len(risks.get('hedged_symbols', []))
-            response += f"Hedged Symbols: {hedged_count}\n\n"
+            parts.append(f"Hedged Symbols: {hedged_count}\n\n")
 
             if high_risk:
-                response += f"<b>⚠️ High Risk Positions ({len(high_risk)})</b>\n"
-                for pos in high_risk[:5]:  # Show top 5
-                    response += f"• {pos['symbol']} ({pos['side'].upper()})\n"
-                    response += f"  Lev: {pos['leverage']}x | Liq: {pos['liquidation_distance_pct']:.2f}%\n"
-                response += "\n"
+                parts.append(f"<b>⚠️ High Risk Positions ({high_risk_count})</b>\n")
+                for pos in high_risk:  # Show top 5
+                    parts.append(f"• {pos['symbol']} ({pos['side'].upper()})\n")
+                    parts.append(f"  Lev: {pos['leverage']}x | Liq: {pos['liquidation_distance_pct']:.2f}%\n")
+                parts.append("\n")
             
             # Suggestions
             if suggestions:
-                response += f"<b>💡 Suggestions</b>\n\n"
+                parts.append(f"<b>💡 Suggestions</b>\n\n")
                 
                 if suggestions.get('urgent'):
-                    response += f"🔴 <b>URGENT:</b>\n"
+                    parts.append(f"🔴 <b>URGENT:</b>\n")
                     for sug in suggestions['urgent'][:3]:
-                        response += f"• {html.escape(sug)}\n"
-                    response += "\n"
+                        parts.append(f"• {html.escape(sug)}\n")
+                    parts.append("\n")
                 
                 if suggestions.get('recommended'):
-                    response += f"🟡 <b>RECOMMENDED:</b>\n"
+                    parts.append(f"🟡 <b>RECOMMENDED:</b>\n")
                     for sug in suggestions['recommended'][:3]:
-                        response += f"• {html.escape(sug)}\n"
-                    response += "\n"
+                        parts.append(f"• {html.escape(sug)}\n")
+                    parts.append("\n")
             
-            # Split message if too long
+            response = "".join(parts)
             
             # Add navigation buttons
             keyboard = self.get_navigation_keyboard(exclude='analyze')
             
-            # Split message if too long
-            if len(response) > 4096:
-                for i in range(0, len(response), 4096):
-                    if i == 0:
-                        await message.edit_text(response[i:i+4096], parse_mode='HTML', reply_markup=keyboard)
-                    else:
-                        await update.effective_chat.send_message(response[i:i+4096], parse_mode='HTML')
-            else:
-                await message.edit_text(response, parse_mode='HTML', reply_markup=keyboard)
+            await self._send_chunked(update, message, response, keyboard)
                 
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
             keyboard = self.get_navigation_keyboard()
-            await message.edit_text(error_msg, reply_markup=keyboard)
+            await _edit_text(message, error_msg, reply_markup=keyboard)
             logger.error(f"Error analyzing positions: {e}")
 
     async def show_recent_trades(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Show recent trade history (last 24h) using Executions."""
-        if update.callback_query:
-            await update.callback_query.answer()
-            message = await update.callback_query.edit_message_text("📡 Fetching recent executions (Linear + Options)...")
-        else:
-            message = await update.message.reply_text("📡 Fetching recent executions (Linear + Options)...")
+        message = await self._ack(update, "📡 Fetching recent executions (Linear + Options)...")
             
         try:
             # Calculate start time (24 hours ago)
-            import datetime
             now_utc = datetime.datetime.now(datetime.timezone.utc)
             start_time_dt = now_utc - datetime.timedelta(hours=24)
             start_time_ms = int(start_time_dt.timestamp() * 1000)
             
             logger.info(f"Fetching trades for last 24h. Start time: {start_time_ms} ({start_time_dt})")
 
-            # Run API calls concurrently
-            loop = asyncio.get_running_loop()
-            
-            # Fetch Linear executions
-            task_linear = loop.run_in_executor(
-                None, 
-                lambda: bybit_api.get_recent_trades(category='linear', limit=50)
-            )
-            
-            # Fetch Option executions
-            task_option = loop.run_in_executor(
-                None, 
-                lambda: bybit_api.get_recent_trades(category='option', limit=50)
+            # Fetch Linear and Option executions concurrently; one failing
+            # category must not hide the other
+            linear_trades, option_trades = await asyncio.gather(
+                _offload(bybit_api.get_recent_trades, category='linear', limit=50),
+                _offload(bybit_api.get_recent_trades, category='option', limit=50),
+                return_exceptions=True
             )
             
-            try:
-                linear_trades = await task_linear
-            except Exception as e:
-                logger.error(f"Failed to fetch linear trades: {e}")
+            if isinstance(linear_trades, Exception):
+                logger.error(f"Failed to fetch linear trades: {linear_trades}")
                 linear_trades = []
-
-            try:
-                option_trades = await task_option
-            except Exception as e:
-                logger.error(f"Failed to fetch option trades: {e}")
+            
+            if isinstance(option_trades, Exception):
+                logger.error(f"Failed to fetch option trades: {option_trades}")
                 option_trades = []
                 
             # Combine trades
@@ -730,21 +894,20 @@ class TelegramBot:
             trades = filtered_trades
             logger.info(f"Trades after filtering: {len(trades)}")
             
-            # Sort trades by execution time (newest first)
-            trades.sort(key=lambda x: float(x.get('execTime', 0)), reverse=True)
-            
             if not trades:
                 keyboard = self.get_navigation_keyboard(exclude='trades')
-                await message.edit_text("ℹ️ No recent trades found in the last 24h.", reply_markup=keyboard)
+                await _edit_text(message, "ℹ️ No recent trades found in the last 24h.", reply_markup=keyboard)
                 return
                 
-            response = f"📈 <b>Last 24h Trades</b>\n"
-            response += f"{'='*30}\n\n"
+            parts = [
+                f"📈 <b>Last 24h Trades</b>\n",
+                f"{SHORT_SEPARATOR}\n\n"
+            ]
             
+            # Pick the newest trades without sorting the whole list, then
+            # order them oldest to newest for display
             display_count = min(len(trades), 20)
-            trades_to_show = trades[:display_count]
-            
-            # Sort ascending (oldest to newest) for display
+            trades_to_show = heapq.nlargest(display_count, trades, key=lambda x: float(x.get('execTime', 0)))
             trades_to_show.sort(key=lambda x: float(x.get('execTime', 0)))
             
             for trade in trades_to_show:
@@ -761,74 +924,53 @@ class TelegramBot:
                 dt = datetime.datetime.fromtimestamp(time_ms / 1000, tz=datetime.timezone.utc)
                 time_str = dt.strftime('%m-%d %H:%M:%S')
                 
-                side_emoji = "🟢" if side == "Buy" else "🔴"
+                side_emoji = GREEN if side == "Buy" else RED
                 type_icon = "🅾️" if is_option else "Lx"
                 
-                response += f"{side_emoji} <b>{symbol}</b> ({side})\n"
-                response += f"  Price: ${price:.4f} | Qty: {qty}\n"
-                response += f"  Time: {time_str} | {type_icon}\n\n"
+                parts.append(f"{side_emoji} <b>{symbol}</b> ({side})\n")
+                parts.append(f"  Price: ${price:.4f} | Qty: {qty}\n")
+                parts.append(f"  Time: {time_str} | {type_icon}\n\n")
                 
             if len(trades) > display_count:
-                response += f"<i>Showing last {display_count} of {len(trades)} trades</i>"
+                parts.append(f"<i>Showing last {display_count} of {len(trades)} trades</i>")
             else:
-                response += f"<i>Total {len(trades)} trades (Lin+Opt)</i>"
+                parts.append(f"<i>Total {len(trades)} trades (Lin+Opt)</i>")
+            response = "".join(parts)
             
             keyboard = self.get_navigation_keyboard(exclude='trades')
-            await message.edit_text(response, parse_mode='HTML', reply_markup=keyboard)
+            await _edit_text(message, response, parse_mode=ParseMode.HTML, reply_markup=keyboard)
             
         except Exception as e:
             logger.error(f"Error in show_recent_trades: {e}", exc_info=True)
             error_msg = f"❌ Error: {str(e)}"
             keyboard = self.get_navigation_keyboard()
-            await message.edit_text(error_msg, reply_markup=keyboard)
+            await _edit_text(message, error_msg, reply_markup=keyboard)
 
 
     async def show_daily_pnl(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Show Profit & Loss for the last 24 hours (Linear + Options)."""
-        if update.callback_query:
-            await update.callback_query.answer()
-            message = await update.callback_query.edit_message_text("💰 Calculating 24h PnL (Linear + Options)...")
-        else:
-            message = await update.message.reply_text("💰 Calculating 24h PnL (Linear + Options)...")
+        message = await self._ack(update, "💰 Calculating 24h PnL (Linear + Options)...")
             
         try:
-            # Calculate start time (24 hours ago)
-            import datetime
+            # Calculate start time (24 hours ago), rounded down to the minute
+            # so repeated presses reuse the cached closed PnL
             now = datetime.datetime.now(datetime.timezone.utc)
-            start_time_dt = now - datetime.timedelta(hours=24)
+            start_time_dt = (now - datetime.timedelta(hours=24)).replace(second=0, microsecond=0)
             start_time = int(start_time_dt.timestamp() * 1000)
 
-            loop = asyncio.get_running_loop()
-            
-            # Fetch PnL concurrently
-            task_linear = loop.run_in_executor(
-                None, 
-                lambda: bybit_api.get_closed_pnl(category='linear', start_time=start_time)
+            # Fetch PnL and open positions concurrently (positions are Linear
+            # only for now, Options usually short term but could check);
+            # a failed fetch counts as empty
+            results = await asyncio.gather(
+                _offload(bybit_api.get_closed_pnl, category='linear', start_time=start_time),
+                _offload(bybit_api.get_closed_pnl, category='option', start_time=start_time),
+                _offload(bybit_api.get_positions),
+                return_exceptions=True
             )
-            task_option = loop.run_in_executor(
-                None, 
-                lambda: bybit_api.get_closed_pnl(category='option', start_time=start_time)
+            closed_pnl_linear, closed_pnl_option, positions = (
+                [] if isinstance(r, Exception) else r for r in results
             )
             
-            # Fetch open positions (Linear only for now, Options usually short term but could check)
-            # bybit_api.get_positions() defaults to 'linear'
-            task_positions = loop.run_in_executor(None, bybit_api.get_positions)
-
-            try:
-                closed_pnl_linear = await task_linear
-            except Exception:
-                closed_pnl_linear = []
-                
-            try:
-                closed_pnl_option = await task_option
-            except Exception:
-                closed_pnl_option = []
-
-            try:
-                positions = await task_positions
-            except Exception:
-                positions = []
-            
             # Calculate Realized PnL (24h)
             pnl_linear = sum(float(item.get('closedPnl', 0)) for item in closed_pnl_linear)
             pnl_option = sum(float(item.get('closedPnl', 0)) for item in closed_pnl_option)
@@ -843,31 +985,34 @@ class TelegramBot:
             total_daily_pnl = realized_pnl + unrealized_pnl
             
             # Formatting
-            r_emoji = "🟢" if realized_pnl >= 0 else "🔴"
-            u_emoji = "🟢" if unrealized_pnl >= 0 else "🔴"
-            t_emoji = "🟢" if total_daily_pnl >= 0 else "🔴"
+            r_emoji = GREEN if realized_pnl >= 0 else RED
+            u_emoji = GREEN if unrealized_pnl >= 0 else RED
+            t_emoji = GREEN if total_daily_pnl >= 0 else RED
             
-            response = f"📊 <b>Rolling 24h Profit & Loss</b>\n"
-            response += f"{'='*30}\n\n"
+            parts = [
+                f"📊 <b>Rolling 24h Profit & Loss</b>\n",
+                f"{SHORT_SEPARATOR}\n\n"
+            ]
             
-            response += f"<b>💵 Realized PnL (24h)</b>\n"
-            response += f"Linear: ${pnl_linear:,.2f}\n"
-            response += f"Options: ${pnl_option:,.2f}\n"
-            response += f"{r_emoji} <b>Total: ${realized_pnl:,.2f}</b> ({trade_count} trades)\n\n"
+            parts.append(f"<b>💵 Realized PnL (24h)</b>\n")
+            parts.append(f"Linear: ${pnl_linear:,.2f}\n")
+            parts.append(f"Options: ${pnl_option:,.2f}\n")
+            parts.append(f"{r_emoji} <b>Total: ${realized_pnl:,.2f}</b> ({trade_count} trades)\n\n")
             
-            response += f"<b>🔓 Unrealized PnL (Open Linear)</b>\n"
-            response += f"{u_emoji} <b>${unrealized_pnl:,.2f}</b>\n\n"
+            parts.append(f"<b>🔓 Unrealized PnL (Open Linear)</b>\n")
+            parts.append(f"{u_emoji} <b>${unrealized_pnl:,.2f}</b>\n\n")
             
-            response += f"{'='*30}\n"
-            response += f"<b>💰 Total PnL: {t_emoji} ${total_daily_pnl:,.2f}</b>\n"
+            parts.append(f"{SHORT_SEPARATOR}\n")
+            parts.append(f"<b>💰 Total PnL: {t_emoji} ${total_daily_pnl:,.2f}</b>\n")
+            response = "".join(parts)
             
             keyboard = self.get_navigation_keyboard(exclude='pnl')
-            await message.edit_text(response, parse_mode='HTML', reply_markup=keyboard)
+            await _edit_text(message, response, parse_mode=ParseMode.HTML, reply_markup=keyboard)
             
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
             keyboard = self.get_navigation_keyboard()
-            await message.edit_text(error_msg, reply_markup=keyboard)
+            await _edit_text(message, error_msg, reply_markup=keyboard)
             logger.error(f"Error calculating PnL: {e}")
 
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -878,25 +1023,42 @@ class TelegramBot:
         if not self.chat_id and update.effective_chat:
              self._save_chat_id(update.effective_chat.id)
         
-        if query.data == 'balance':
-            await self.show_balance(update, context)
-        elif query.data == 'pnl':
-            await self.show_daily_pnl(update, context)
-        elif query.data == 'list':
-            await self.list_positions(update, context)
-        elif query.data == 'orders':
-            await self.list_orders(update, context)
-        elif query.data == 'trades':
-            await self.show_recent_trades(update, context)
-        elif query.data == 'analyze':
-            await self.analyze_positions(update, context)
-        elif query.data == 'help':
-            await self.help_command(update, context)
+        handler = self._callback_handlers.get(query.data)
+        if not handler:
+            return
+        
+        # Collapse repeated taps on a button whose report is still loading
+        key = (update.effective_chat.id, query.data)
+        if key in self._inflight:
+            await query.answer("⏳ Already loading...")
+            return
+        
+        self._inflight.add(key)
+        try:
+            await handler(update, context)
+        finally:
+            self._inflight.discard(key)
     
     def run(self):
         """Run the bot."""
         # Create application
-        application = Application.builder().token(self.token).post_init(self.post_init).build()
+        # Handle up to 32 updates at once so one slow report doesn't hold up
+        # other chats; handlers only await I/O or offloaded work
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .post_init(self.post_init)
+            .concurrent_updates(32)
+        )
+        
+        # Throttle outgoing messages to Telegram's limits (30/s overall, about
+        # 1/s per chat) so split reports don't trigger flood-wait errors
+        try:
+            builder = builder.rate_limiter(AIORateLimiter(overall_max_rate=30, max_retries=3))
+        except RuntimeError:
+            logger.warning("python-telegram-bot[rate-limiter] not installed - sending without rate limiting")
+        
+        application = builder.build()
         
         # Add handlers
         application.add_handler(CommandHandler("start", self.start))
@@ -909,13 +1071,34 @@ class TelegramBot:
         application.add_handler(CommandHandler("analyze", self.analyze_positions))
         application.add_handler(CallbackQueryHandler(self.button_callback))
         
+        # Only messages (commands) and button presses are handled
+        allowed_updates = [Update.MESSAGE, Update.CALLBACK_QUERY]
+        
         # Run the bot
-        logger.info("Starting Telegram bot...")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if Config.WEBHOOK_URL:
+            logger.info("Starting Telegram bot (webhook)...")
+            application.run_webhook(
+                listen=Config.WEBHOOK_LISTEN,
+                port=Config.WEBHOOK_PORT,
+                url_path=self.token,
+                webhook_url=f"{Config.WEBHOOK_URL.rstrip('/')}/{self.token}",
+                allowed_updates=allowed_updates
+            )
+        else:
+            logger.info("Starting Telegram bot...")
+            application.run_polling(allowed_updates=allowed_updates)
 
 
 def main():
     """Main entry point."""
+    # Use uvloop's faster event loop when it is installed (optional)
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        uvloop.install()
+    
     # Validate configuration
     is_valid, error = Config.validate()
     if not is_valid:
@@ -4,7 +4,7 @@ Test script to validate analyzer logic with mock data.
 """
 
 import json
-from analyzer import analyze_positions
+from analyzer import analyze_positions, categorize_symbol, calculate_leverage_risk
 
 # Mock position data (simulating Bybit API response)
 mock_positions = [
@@ -146,5 +146,33 @@ def test_analyzer():
 
     print("\n✅ Test completed successfully!")
 
+def test_categorize_symbol():
+    """Check symbol cluster classification."""
+    assert categorize_symbol('BTCUSDT') == 'BTC'
+    assert categorize_symbol('ethusdt') == 'ETH'
+    assert categorize_symbol('ARBUSDT') == 'L2'
+    assert categorize_symbol('1000PEPEUSDT') == 'MEME'
+    assert categorize_symbol('TAOUSDT') == 'AI'
+    assert categorize_symbol('SOLUSDT') == 'OTHER'
+    # Several clusters match: the first one in SYMBOL_CLUSTERS wins
+    assert categorize_symbol('ETHBTC') == 'BTC'
+    assert categorize_symbol('OPBTC') == 'BTC'
+    assert categorize_symbol('ARBETH') == 'ETH'
+    # Overlapping keywords (DOGE / ETH) are both seen
+    assert categorize_symbol('DOGETHUSDT') == 'ETH'
+
+
+def test_calculate_leverage_risk():
+    """Check leverage risk bucket boundaries."""
+    assert calculate_leverage_risk(1) == 'safe'
+    assert calculate_leverage_risk(4.99) == 'safe'
+    assert calculate_leverage_risk(5) == 'medium'
+    assert calculate_leverage_risk(10) == 'medium'
+    assert calculate_leverage_risk(10.01) == 'high'
+    assert calculate_leverage_risk(50) == 'high'
+
+
 if __name__ == '__main__':
     test_analyzer()
+    test_categorize_symbol()
+    test_calculate_leverage_risk()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Tests for the ttl_cache decorator.
+"""
+
+import threading
+import time
+from unittest import mock
+
+import cache
+from cache import ttl_cache
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when told to."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expiry():
+    """Results are reused within the TTL and fetched again after it."""
+    clock = FakeClock()
+    calls = []
+    
+    @ttl_cache(5)
+    def fetch(x):
+        calls.append(x)
+        return x * 2
+    
+    with mock.patch.object(cache.time, 'monotonic', clock):
+        assert fetch(1) == 2
+        assert fetch(1) == 2
+        assert calls == [1]
+        
+        clock.now += 4.9
+        fetch(1)
+        assert calls == [1]
+        
+        clock.now += 0.2
+        fetch(1)
+        assert calls == [1, 1]
+
+
+def test_ttl_cache_maxsize():
+    """The oldest result is dropped once maxsize is exceeded."""
+    calls = []
+    
+    @ttl_cache(60, maxsize=2)
+    def fetch(x):
+        calls.append(x)
+        return x
+    
+    fetch('a')
+    fetch('b')
+    fetch('c')
+    assert calls == ['a', 'b', 'c']
+    
+    fetch('c')
+    fetch('b')
+    assert calls == ['a', 'b', 'c']
+    
+    fetch('a')
+    assert calls == ['a', 'b', 'c', 'a']
+
+
+def test_ttl_cache_normalizes_arguments():
+    """Positional, keyword and default spellings of a call share one entry."""
+    calls = []
+    
+    @ttl_cache(60)
+    def fetch(category='linear', settle_coin='USDT'):
+        calls.append((category, settle_coin))
+        return [category, settle_coin]
+    
+    assert fetch() == ['linear', 'USDT']
+    assert fetch('linear', 'USDT') == ['linear', 'USDT']
+    assert fetch(category='linear') == ['linear', 'USDT']
+    assert fetch(settle_coin='USDT', category='linear') == ['linear', 'USDT']
+    assert calls == [('linear', 'USDT')]
+    
+    fetch('option')
+    assert calls == [('linear', 'USDT'), ('option', 'USDT')]
+
+
+def test_ttl_cache_returns_shallow_copy():
+    """Callers may reorder the returned list without touching the cache."""
+    item = {'symbol': 'BTCUSDT'}
+    
+    @ttl_cache(60)
+    def fetch():
+        return [item, {'symbol': 'ETHUSDT'}]
+    
+    first = fetch()
+    first.reverse()
+    first.append({'symbol': 'SOLUSDT'})
+    
+    second = fetch()
+    assert [p['symbol'] for p in second] == ['BTCUSDT', 'ETHUSDT']
+    # Items are shared, only the container is copied
+    assert second[0] is item
+
+
+def test_ttl_cache_coalesces_concurrent_misses():
+    """Concurrent callers with the same arguments share one call."""
+    release = threading.Event()
+    calls = []
+    
+    @ttl_cache(60)
+    def fetch(x):
+        calls.append(x)
+        release.wait(5)
+        return [x]
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch(7))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+    
+    assert calls == [7]
+    assert results == [[7]] * 5
+
+
+def test_ttl_cache_shares_exceptions():
+    """Waiting callers see the owner's exception, and it is not cached."""
+    release = threading.Event()
+    calls = []
+    
+    @ttl_cache(60)
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError('boom')
+    
+    errors = []
+    
+    def worker():
+        try:
+            fetch()
+        except ValueError as e:
+            errors.append(str(e))
+    
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+    
+    assert calls == [1]
+    assert errors == ['boom'] * 3
+    
+    try:
+        fetch()
+    except ValueError:
+        pass
+    assert calls == [1, 1]
+
+
+def test_ttl_cache_clear_discards_in_flight_result():
+    """A result fetched before cache_clear() is returned but not stored."""
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    @ttl_cache(60)
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            return 'old'
+        return 'new'
+    
+    results = []
+    owner = threading.Thread(target=lambda: results.append(fetch()))
+    owner.start()
+    started.wait(5)
+    fetch.cache_clear()
+    release.set()
+    owner.join(5)
+    
+    assert results == ['old']
+    assert fetch() == 'new'
+    assert calls == [1, 1]
+
+
+if __name__ == '__main__':
+    test_ttl_cache_expiry()
+    test_ttl_cache_maxsize()
+    test_ttl_cache_normalizes_arguments()
+    test_ttl_cache_returns_shallow_copy()
+    test_ttl_cache_coalesces_concurrent_misses()
+    test_ttl_cache_shares_exceptions()
+    test_ttl_cache_clear_discards_in_flight_result()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for Telegram message splitting.
+"""
+
+from telegram_bot import _chunk_html
+
+
+def test_chunk_html_short_text():
+    """Text within the limit is sent as one chunk."""
+    assert _chunk_html("hello", limit=10) == ["hello"]
+    assert _chunk_html("x" * 10, limit=10) == ["x" * 10]
+
+
+def test_chunk_html_cuts_at_blank_lines():
+    """Blocks are kept whole and the blank lines between them fall at the cuts."""
+    blocks = [f"<b>Block {i}</b>\nline a\nline b" for i in range(20)]
+    text = "\n\n".join(blocks)
+    chunks = _chunk_html(text, limit=100)
+    
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    # Nothing lost: rejoining at the dropped separators restores the text
+    assert "\n\n".join(chunks) == text
+    for chunk in chunks:
+        assert chunk.startswith("<b>Block ")
+        assert chunk.endswith("line b")
+
+
+def test_chunk_html_falls_back_to_line_breaks():
+    """A block longer than the limit is cut at single line breaks."""
+    lines = [f"<i>row {i:02d}</i>" for i in range(30)]
+    block = "\n".join(lines)
+    text = f"header\n\n{block}\n\nfooter"
+    chunks = _chunk_html(text, limit=60)
+    
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    assert chunks[0] == "header"
+    # Every line survives intact and in order; only line breaks at cuts go
+    assert [line for chunk in chunks for line in chunk.split("\n") if line] == ["header", *lines, "footer"]
+
+
+def test_chunk_html_hard_slices_overlong_line():
+    """A single line over the limit is sliced without losing characters."""
+    line = "".join(chr(ord('a') + i % 26) for i in range(250))
+    text = f"intro\n\n{line}\n\noutro"
+    chunks = _chunk_html(text, limit=100)
+    
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[0] == "intro"
+    assert chunks[1] == line[:100]
+    assert chunks[2] == line[100:200]
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+
+if __name__ == '__main__':
+    test_chunk_html_short_text()
+    test_chunk_html_cuts_at_blank_lines()
+    test_chunk_html_falls_back_to_line_breaks()
+    test_chunk_html_hard_slices_overlong_line()